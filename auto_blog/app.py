@@ -2,15 +2,14 @@ import streamlit as st
 import pandas as pd
 import os
 import sys
-import random
-import json
-import datetime
+import time
+import threading
+import collections
 
 # Ensure import works
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from auto_blog import trends, content, wordpress, images
-from auto_blog.main import HISTORY_FILE
-from auto_blog.config import WP_USERNAME, WP_PASSWORD
+from auto_blog import trends, content, wordpress, posts, history, jobs
+from auto_blog.config import SITE_URL, WP_USERNAME, WP_PASSWORD, MASS_WRITE_WORKERS, MASS_MEDIA_WORKERS, MASS_PUBLISH_WORKERS
 
 st.set_page_config(page_title="Auto-Blog Pro", page_icon="🚀", layout="wide")
 
@@ -65,6 +64,64 @@ if 'niche_input' not in st.session_state:
 if 'sub_niche' not in st.session_state:
     st.session_state.sub_niche = ""
 
+RESEARCH_MEMO_TTL = 6 * 3600  # Seconds a finished research run is reused
+RESEARCH_MEMO_MAX_ENTRIES = 50  # Oldest research runs are dropped past this
+
+class ResearchMemo:
+    """
+    Finished research runs keyed by (niche, sub_niche, region, time_range),
+    shared by every session. Script threads run concurrently, so access is
+    locked; entries expire after RESEARCH_MEMO_TTL and the least recently
+    used are dropped past RESEARCH_MEMO_MAX_ENTRIES.
+    """
+    def __init__(self, ttl=RESEARCH_MEMO_TTL, max_entries=RESEARCH_MEMO_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # key -> (saved_at, results)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """
+        (saved_at, results) if a fresh run is saved for key, else None.
+        """
+        with self._lock:
+            saved = self._entries.get(key)
+            if saved is None:
+                return None
+            if time.time() - saved[0] >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return saved
+
+    def set(self, key, results):
+        with self._lock:
+            self._entries[key] = (time.time(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+@st.cache_resource
+def get_researcher():
+    # One researcher (and one pytrends cookie bootstrap) per server process
+    return trends.KeywordResearcher()
+
+@st.cache_resource
+def get_wp_pool():
+    return wordpress.ClientPool()
+
+@st.cache_resource
+def get_research_memo():
+    return ResearchMemo()
+
 # Sidebar Navigation
 with st.sidebar:
     st.header("Navigation")
@@ -73,6 +130,37 @@ with st.sidebar:
     if st.button("📝 Step 2: Ideation", key="nav_two"): st.session_state.step = 2
     if st.button("🏭 Step 3: Mass Auto", key="nav_three"): st.session_state.step = 3
     st.markdown("---")
+    # Mass runs happen in the job workers: add up what they report with
+    # their heartbeats and what this process did (research, ideation)
+    process_stats = [jobs.runtime_stats()] + jobs.get_job_store().worker_stats()
+    cache_entries = content.get_llm_cache().stats()['entries']
+    cache_hits = sum(s['llm_hits'] for s in process_stats)
+    cache_misses = sum(s['llm_misses'] for s in process_stats)
+    st.caption(f"LLM cache: {cache_entries} entries, {cache_hits} hits / {cache_misses} misses")
+    round_trips_saved = sum(s['round_trips_saved'] for s in process_stats)
+    if round_trips_saved:
+        st.caption(f"WordPress batching: {round_trips_saved} round trips saved")
+    for process in process_stats:
+        for provider, stats in process['limiters'].items():
+            if stats['queue_depth'] or stats['paused_for']:
+                st.caption(f"⏳ {provider}: {stats['queue_depth']} waiting, paused {stats['paused_for']}s")
+    if st.button("🧹 Clear LLM Cache"):
+        content.get_llm_cache().clear()
+        st.toast("LLM cache cleared")
+    if st.button("🔄 Resync Post Index"):
+        with st.spinner("Re-reading every published post..."):
+            with get_wp_pool().client() as client:
+                result = posts.sync(client, full=True)
+        st.toast(f"Post index: {result['posts']} posts")
+    research_memo = get_research_memo()
+    if research_memo and st.button(f"♻️ Clear Research Results ({len(research_memo)})"):
+        research_memo.clear()
+        st.toast("Saved research results cleared")
+    if st.button("🔌 Reset Shared Clients"):
+        # Next use rebuilds the Trends session and WordPress connections
+        get_researcher.clear()
+        get_wp_pool.clear()
+        st.toast("Shared clients reset")
     if st.button("Log Out"):
         st.session_state["password_correct"] = False
         st.session_state.clear()
@@ -80,45 +168,71 @@ with st.sidebar:
 
 st.title("🚀 Auto-Blog Ultra")
 
+RESEARCH_COLUMNS = {
+    "score": st.column_config.ProgressColumn("Priority Score", format="%.1f", min_value=0, max_value=100),
+    "trend": st.column_config.NumberColumn("Trend (avg)", format="%.1f"),
+    "trend_series": st.column_config.LineChartColumn("Trend", y_min=0, y_max=100),
+    "kd": "KD (Diff)",
+    "volume": "Vol (Est)"
+}
+
+DASHBOARD_PAGE_SIZE = 50
+VALIDATIONS_SHOWN = 3  # Latest posts whose validation checks each job panel shows
+
+@st.cache_resource
+def get_activity_summary():
+    # One summary per server process, shared by every session and rerun
+    return history.ActivitySummary(history.get_history_store())
+
+def activity_row(entry):
+    """
+    Flattens one activity entry (validation flags included) for the table.
+    """
+    validations = entry.get("validations") or {}
+    return {
+        "Date": entry.get("timestamp", ""),
+        "Title": entry.get("title", ""),
+        "Status": entry.get("status") or "Unknown",
+        "Word Count": "✅" if validations.get("Word Count > 1500", False) else "❌",
+        "FAQ": "✅" if validations.get("FAQ Section", False) else "❌",
+        "SEO Meta": "✅" if validations.get("SEO Meta", False) else "-",
+    }
+
 # --- STEP 4: DASHBOARD ---
 if st.session_state.step == 4:
     st.header("📊 Activity Dashboard")
     
-    # Load JSON History
-    history_data = []
-    if os.path.exists("post_history.json"):
-        with open("post_history.json", "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    history_data.append(json.loads(line))
-                except: pass
+    # Only events logged since the last render are read
+    summary = get_activity_summary()
+    summary.refresh()
     
-    if not history_data:
+    if not summary.total:
         st.info("No activity logged yet. Start publishing to see stats here!")
     else:
         # Summary Metrics
-        total_posts = len(history_data)
-        st.metric("Total Published Posts", total_posts)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Published Posts", summary.total)
+        col2.metric("Images per Post", f"{summary.images_per_post():.1f}")
+        col3.metric("Days Active", len(summary.per_day))
         
-        # Detailed Table
-        st.subheader("Recent Activity Log")
+        daily = summary.daily_counts()
+        if daily:
+            st.subheader("Posts per Day")
+            st.bar_chart(pd.DataFrame(daily, columns=["Day", "Posts"]).set_index("Day"))
         
-        # Flatten validation stats for table display
-        table_rows = []
-        for entry in history_data:
-            row = {
-                "Date": entry.get("timestamp", ""),
-                "Title": entry.get("title", ""),
-                "Status": entry.get("status", "Unknown"),
-            }
-            # Add validation flags
-            validations = entry.get("validations", {})
-            row["Word Count"] = "✅" if validations.get("Word Count > 1500", False) else "❌"
-            row["FAQ"] = "✅" if validations.get("FAQ Section", False) else "❌"
-            row["SEO Meta"] = "✅" if validations.get("SEO Meta", False) else "-"
-            table_rows.append(row)
-            
-        df_history = pd.DataFrame(table_rows)
+        pass_rates = summary.pass_rates()
+        if pass_rates:
+            st.subheader("Validation Pass Rates")
+            rate_cols = st.columns(len(pass_rates))
+            for col, (name, rate) in zip(rate_cols, sorted(pass_rates.items())):
+                col.metric(name, f"{rate:.0%}")
+        
+        # Detailed Table: one page at a time, newest first
+        st.subheader("Recent Activity Log")
+        pages = (summary.total - 1) // DASHBOARD_PAGE_SIZE + 1
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+        entries = history.get_history_store().recent_events(offset=(page - 1) * DASHBOARD_PAGE_SIZE, limit=DASHBOARD_PAGE_SIZE)
+        df_history = pd.DataFrame([activity_row(entry) for entry in entries])
         st.dataframe(df_history, use_container_width=True)
 
 
@@ -130,8 +244,7 @@ elif st.session_state.step == 1:
     st.subheader("🔥 Trending Niche Ideas")
     if st.button("✨ Suggest Hot Niches"):
         with st.spinner("Analyzing market trends..."):
-            researcher = trends.KeywordResearcher()
-            suggestions = researcher.suggest_niches()
+            suggestions = get_researcher().suggest_niches()
             st.session_state.niche_suggestions = suggestions
             
     if 'niche_suggestions' in st.session_state and st.session_state.niche_suggestions:
@@ -160,10 +273,22 @@ elif st.session_state.step == 1:
             st.session_state.niche = niche
             st.session_state.sub_niche = sub_niche
             
-            with st.spinner(f"Performing 7-Step Analysis for '{niche}' in {region}..."):
-                researcher = trends.KeywordResearcher()
-                results = researcher.analyze_niche(niche, sub_niche, region, time_range)
-                st.session_state.research_results = results
+            memo_key = (niche.strip().lower(), sub_niche.strip().lower(), region, time_range)
+            saved = get_research_memo().get(memo_key)
+            if saved:
+                st.session_state.research_results = saved[1]
+                st.caption(f"Reusing research from {int((time.time() - saved[0]) // 60)} min ago (clear it in the sidebar to re-run).")
+            else:
+                with st.spinner(f"Performing 7-Step Analysis for '{niche}' in {region}..."):
+                    # Table fills in as each chunk of keyword metrics arrives
+                    live_table = st.empty()
+                    results = []
+                    for results in get_researcher().iter_analyze_niche(niche, sub_niche, region, time_range):
+                        live_table.dataframe(pd.DataFrame(results), column_config=RESEARCH_COLUMNS, use_container_width=True)
+                    live_table.empty()
+                    st.session_state.research_results = results
+                    if results:
+                        get_research_memo().set(memo_key, results)
                 
     # 3. Results Table
     if st.session_state.research_results:
@@ -175,12 +300,7 @@ elif st.session_state.step == 1:
         # Display as interactive table
         st.dataframe(
             df,
-            column_config={
-                "score": st.column_config.ProgressColumn("Priority Score", format="%.1f", min_value=0, max_value=100),
-                "trend": st.column_config.LineChartColumn("Trend (90d)"),
-                "kd": "KD (Diff)",
-                "volume": "Vol (Est)"
-            },
+            column_config=RESEARCH_COLUMNS,
             use_container_width=True
         )
         
@@ -202,30 +322,20 @@ elif st.session_state.step == 2:
     st.info(f"Generating titles for {len(st.session_state.selected_keywords)} keywords. This might take a moment due to rate limits...")
     
     if not st.session_state.generated_titles:
-        import concurrent.futures
-        
         progress_bar = st.progress(0)
         status_text = st.empty()
-        
-        # Parallelize title generation
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_kw = {executor.submit(content.generate_titles, kw, count=5): kw for kw in st.session_state.selected_keywords}
-            
-            completed_count = 0
-            for future in concurrent.futures.as_completed(future_to_kw):
-                kw = future_to_kw[future]
-                try:
-                    titles = future.result()
-                    if titles:
-                        st.session_state.generated_titles[kw] = titles
-                except Exception as e:
-                    st.error(f"Error generating titles for {kw}: {e}")
-                
-                completed_count += 1
-                progress = completed_count / len(st.session_state.selected_keywords)
-                progress_bar.progress(progress)
-                status_text.text(f"Generated titles for {completed_count}/{len(st.session_state.selected_keywords)} keywords...")
-        
+
+        def on_progress(done, total):
+            progress_bar.progress(min(done / total, 1.0))
+            status_text.text(f"Generated titles for {done}/{total} keywords...")
+
+        # One LLM call per chunk of keywords instead of one per keyword
+        try:
+            batch = content.generate_titles_batch(st.session_state.selected_keywords, count=5, progress=on_progress)
+            st.session_state.generated_titles.update(batch)
+        except Exception as e:
+            st.error(f"Error generating titles: {e}")
+
         status_text.empty()
             
     st.write("### Select Best Titles")
@@ -237,7 +347,7 @@ elif st.session_state.step == 2:
         # Load More Button
         if st.button(f"🔄 Generate More Titles for '{kw}'", key=f"more_{kw}"):
             with st.spinner(f"Thinking of more titles for {kw}..."):
-                new_titles = content.generate_titles(kw, count=5)
+                new_titles = content.generate_titles(kw, count=5, fresh=True)
                 if new_titles:
                     st.session_state.generated_titles[kw].extend(new_titles)
                     st.rerun()
@@ -270,165 +380,82 @@ elif st.session_state.step == 3:
     with col1:
         max_posts = st.number_input("Target Total Posts", min_value=10, max_value=1000, value=100)
     with col2:
-        sitemap_url = st.text_input("Sitemap URL (for Pinging)", value=f"{content.SITE_URL}/sitemap.xml")
+        sitemap_url = st.text_input("Sitemap URL (for Pinging)", value=f"{SITE_URL}/sitemap.xml")
 
     # Only show 'final_titles' if they came from Step 2 MANUALLY. 
     # In Mass Mode, we generate them on the fly.
     
+    with st.expander("⚙️ Pipeline Workers", expanded=False):
+        w1, w2, w3 = st.columns(3)
+        with w1:
+            write_workers = st.number_input("Writers (LLM)", min_value=1, max_value=10, value=MASS_WRITE_WORKERS)
+        with w2:
+            media_workers = st.number_input("Image Workers", min_value=1, max_value=10, value=MASS_MEDIA_WORKERS)
+        with w3:
+            publish_workers = st.number_input("Publishers", min_value=1, max_value=5, value=MASS_PUBLISH_WORKERS)
+
+    # Runs happen in a separate worker process, so reruns, refreshes and
+    # closed tabs don't interrupt them; this page only queues and monitors
+    job_store = jobs.get_job_store()
     if st.button("🚀 START INFINITE LOOP", type="primary"):
-        status_container = st.empty()
-        client = wordpress.get_wp_client()
-        
-        # 0. Load History to avoid duplicates
-        posted_titles = set()
-        if os.path.exists("posted_titles.txt"):
-            with open("posted_titles.txt", "r", encoding="utf-8") as f:
-                posted_titles = set([l.strip() for l in f.readlines()])
-        
-        # 1. Fetch Internal Links Index (Once at start)
-        status_container.info("Indexing existing posts for internal linking...")
-        all_posts_index = wordpress.get_all_posts(client)
-        
-        # SYNC HISTORY: Add all existing WP titles to history to prevent duplicates after reload
-        for p in all_posts_index:
-            posted_titles.add(p['title'])
-            
-        st.write(f"Indexed {len(all_posts_index)} existing posts. History synced.")
-        
-        progress_bar = st.progress(0)
-        posts_published = 0
-        
         # Select base keyword(s)
         target_keywords = st.session_state.selected_keywords if st.session_state.selected_keywords else [st.session_state.niche]
-        
-        while posts_published < max_posts:
-            import time
-            import requests
+        job_id = jobs.submit_mass_job(
+            target_keywords, st.session_state.niche, max_posts, sitemap_url,
+            write_workers=write_workers, media_workers=media_workers, publish_workers=publish_workers
+        )
+        st.toast(f"Job #{job_id} queued")
 
-            # Pick a keyword cyclically
-            current_kw = target_keywords[posts_published % len(target_keywords)]
-            
-            # A. Generate Batch of Titles (10)
-            status_container.info(f"Generating fresh titles for '{current_kw}'...")
-            fresh_titles = content.generate_titles(current_kw, count=10)
-            
-            # Filter duplicates
-            unique_titles = [t for t in fresh_titles if t not in posted_titles]
-            
-            if not unique_titles:
-                status_container.warning(f"No new unique titles found for {current_kw}. Skipping...")
-                time.sleep(2)
-                continue
-                
-            # B. Publish Batch
-            for title in unique_titles:
-                if posts_published >= max_posts: break
-                
-                status_container.info(f"Creating post {posts_published+1}/{max_posts}: {title}")
-                
-                # Contextual Linking: Find top 5 relevant links from index (Simple match)
-                # Naive approach: check if any word in title matches existing post title
-                relevant_links = [] 
-                # Shuffle index to keep links varied if no good match found
-                random.shuffle(all_posts_index)
-                relevant_links = all_posts_index[:5]
-                
-                # Generate
-                post_data = content.generate_blog_post(title, st.session_state.niche, internal_links=relevant_links)
-                if not post_data: continue
-                
-                # VALIDATION CHECKS (Visual Feedback)
-                checks = content.validate_post_structure(post_data)
-                validation_results = {c[0]: c[1] for c in checks} # Store for logs
-                all_passed = True
-                
-                with st.expander(f"✅ Validation Checks for: {title}", expanded=False): # Collapsed to save space in mass mode
-                    for name, passed, details in checks:
-                        if passed:
-                            st.write(f"✅ **{name}**: {details}")
-                        else:
-                            st.write(f"❌ **{name}**: {details}")
-                            all_passed = False
-                
-                if not all_passed:
-                    status_container.warning(f"⚠️ Validation issues for '{title}', but publishing...")
-                
-                # SEO Meta Data
-                custom_fields = []
-                if post_data.get('meta_title'):
-                    custom_fields.append({'key': '_yoast_wpseo_title', 'value': post_data['meta_title']})
-                    custom_fields.append({'key': 'rank_math_title', 'value': post_data['meta_title']})
-                    validation_results["SEO Meta"] = True
-                if post_data.get('meta_desc'):
-                    custom_fields.append({'key': '_yoast_wpseo_metadesc', 'value': post_data['meta_desc']})
-                    custom_fields.append({'key': 'rank_math_description', 'value': post_data['meta_desc']})
-                
-                # Images
-                img_urls = images.get_images(title, count=3)
-                uploaded_imgs = []
-                for url in img_urls:
-                    local_path = images.download_image(url)
-                    if local_path:
-                        try:
-                            resp = wordpress.upload_image_to_wp(client, local_path, title)
-                            uploaded_imgs.append(resp)
-                        except: pass
-                        if os.path.exists(local_path): os.remove(local_path)
-                
-                featured_id = uploaded_imgs[0]['id'] if uploaded_imgs else None
-                
-                # Inject Images
-                final_content = post_data['content']
-                if len(uploaded_imgs) > 1:
-                    parts = final_content.split('</h2>')
-                    new_c = ""
-                    e_idx = 1
-                    for i, part in enumerate(parts):
-                        new_c += part
-                        if i < len(parts) - 1: new_c += "</h2>"
-                        if (i == 0 or i == 2) and e_idx < len(uploaded_imgs):
-                            u = uploaded_imgs[e_idx]['url']
-                            new_c += f'<figure><img src="{u}" alt="{title}" style="width:100%; border-radius:10px; margin:20px 0;" /><figcaption>{title}</figcaption></figure>'
-                            e_idx += 1
-                    final_content = new_c
-
-                # Publish
-                try:
-                    wordpress.create_wp_post(client, post_data['title'], final_content, post_data['tags'], featured_id, [st.session_state.niche], custom_fields=custom_fields)
-                    
-                    # Update History (TXT)
-                    with open("posted_titles.txt", "a", encoding="utf-8") as f:
-                        f.write(title + "\n")
-                    posted_titles.add(title)
-                    
-                    # Update History (JSON LOG)
-                    log_entry = {
-                        "title": title,
-                        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "status": "Published",
-                        "validations": validation_results,
-                        "images": len(uploaded_imgs),
-                        "seo_meta": bool(custom_fields)
-                    }
-                    with open("post_history.json", "a", encoding="utf-8") as f:
-                        f.write(json.dumps(log_entry) + "\n")
-                    
-                    # Update Link Index
-                    all_posts_index.append({'title': title, 'link': '#'}) # URL Unknown until fetch, placeholder
-                    
-                    posts_published += 1
-                    
-                except Exception as e:
-                    st.error(f"Error publishing: {e}")
-                
-                progress_bar.progress(posts_published / max_posts)
-            
-            # C. Ping Google (After batch of 10 or less)
-            try:
-                requests.get(f"http://www.google.com/ping?sitemap={sitemap_url}")
-                st.toast("✅ Sitemap Pinged to Google!")
-            except:
-                pass
-                
-        st.balloons()
-        st.success("Mass Generation Complete!")
+    if not job_store.live_workers():
+        st.warning("No job worker is running. Start one here, or run `python -m auto_blog.jobs worker` on the server.")
+        if st.button("▶️ Start Worker"):
+            jobs.spawn_worker()
+            st.toast("Worker starting...")
+
+    st.subheader("Jobs")
+    job_list = job_store.list(limit=10)
+    if not job_list:
+        st.info("No jobs yet.")
+    for job in job_list:
+        params = job['params']
+        progress = job['progress']
+        status = job['status']
+        if job['cancel_requested'] and status in jobs.ACTIVE_STATUSES:
+            status = 'cancelling'
+        with st.expander(f"#{job['id']} · {params.get('niche', '')} · {status}", expanded=status not in jobs.FINAL_STATUSES):
+            published = progress.get('published', 0)
+            st.progress(min(published / max(params.get('max_posts', 1), 1), 1.0))
+            st.caption(f"{published}/{params.get('max_posts')} posts · keywords: {', '.join(params.get('target_keywords', []))}")
+            if job['message']:
+                st.write(job['message'])
+            if job['error']:
+                st.error(job['error'])
+            # VALIDATION CHECKS (Visual Feedback) for the latest posts; expanders can't nest, so inline
+            for event in reversed(job_store.tail(job['id'], limit=VALIDATIONS_SHOWN, event_type='validation')):
+                all_passed = all(passed for _, passed, _ in event['checks'])
+                st.markdown(f"{'✅' if all_passed else '⚠️'} **Validation Checks for: {event['title']}**")
+                st.markdown("\n".join(
+                    f"- {'✅' if passed else '❌'} **{name}**: {details}" for name, passed, details in event['checks']
+                ))
+                if event.get('ttft') is not None:
+                    st.caption(f"⏱️ first token after {event['ttft']:.1f}s, full post in {event['generation_time']:.1f}s")
+            if status not in jobs.FINAL_STATUSES:
+                for event in job_store.tail(job['id']):
+                    if event['type'] in ('warning', 'error'):
+                        st.caption(f"⚠️ {event['message']}")
+                c1, c2 = st.columns(2)
+                if job['pause_requested']:
+                    if c1.button("▶️ Resume", key=f"resume_{job['id']}"):
+                        job_store.resume(job['id'])
+                        st.rerun()
+                elif c1.button("⏸️ Pause", key=f"pause_{job['id']}"):
+                    job_store.pause(job['id'])
+                    st.rerun()
+                if not job['cancel_requested'] and c2.button("⏹️ Cancel", key=f"cancel_{job['id']}"):
+                    job_store.cancel(job['id'])
+                    st.rerun()
+
+    if any(j['status'] not in jobs.FINAL_STATUSES for j in job_list):
+        if st.checkbox("Auto-refresh", value=True):
+            time.sleep(3)
+            st.rerun()
@@ -0,0 +1,116 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+class DiskCache:
+    """
+    Small persistent key/value cache on SQLite.
+    Entries carry their own TTL; when the table grows past max_entries the
+    least recently used rows are evicted.
+    Values are pickled, so anything picklable (strings, dicts, DataFrames) can be stored.
+    """
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # One connection shared by all threads in this process (guarded by _lock);
+        # WAL lets other processes read while we write.
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+        self.conn.commit()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value, or default if missing/expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.conn.commit()
+                self.misses += 1
+                return default
+            self.conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a value. ttl is in seconds; None means it never expires.
+        """
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, blob, expires_at, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def clear(self, prefix=None):
+        """
+        Removes every entry, or only the ones whose key starts with prefix.
+        """
+        with self._lock:
+            if prefix:
+                self.conn.execute("DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (_like_prefix(prefix),))
+            else:
+                self.conn.execute("DELETE FROM cache")
+            self.conn.commit()
+
+    def _evict(self):
+        # Caller holds the lock. Expired rows go first, then the LRU tail.
+        self.conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        count = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def _like_prefix(prefix):
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
@@ -6,18 +6,86 @@ load_dotenv()
 # Google Trends
 TRENDS_TIMEZONE = 360  # CST
 TRENDS_HL = 'en-US'  # Host Language
+TRENDS_BATCH_SIZE = 5  # Max keywords per Trends payload
+TRENDS_CACHE_ENABLED = os.getenv('TRENDS_CACHE_ENABLED', '1') != '0'
+TRENDS_CACHE_PATH = os.getenv('TRENDS_CACHE_PATH', 'trends_cache.sqlite3')
+TRENDS_CACHE_MAX_ENTRIES = int(os.getenv('TRENDS_CACHE_MAX_ENTRIES', 20000))
+METRICS_WORKERS = int(os.getenv('METRICS_WORKERS', 3))  # Parallel LLM keyword-metric chunks
 
 # LLM (OpenRouter)
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 GEMINI_MODEL = "google/gemini-3-flash-preview"
 SITE_URL = "http://localhost:8501"
 SITE_NAME = "Auto-Blog Pro"
+LLM_POOL_CONNECTIONS = 4  # Distinct hosts kept in the pool
+LLM_POOL_MAXSIZE = int(os.getenv('LLM_POOL_MAXSIZE', 10))  # Max open connections per host
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', 10))  # Seconds
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', 300))  # Seconds (reasoning calls are slow)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 5))  # Bound for aquery_llm
+
+# LLM Response Cache
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') != '0'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'llm_cache.sqlite3')
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 5000))
+LLM_CACHE_DEFAULT_TTL = 6 * 3600  # Seconds
 
 # WordPress
 WP_URL = os.getenv('WP_URL')
 WP_USERNAME = os.getenv('WP_USERNAME')
 WP_PASSWORD = os.getenv('WP_PASSWORD')  # Application Password
+WP_BACKEND = os.getenv('WP_BACKEND', 'xmlrpc')  # xmlrpc | rest (falls back to xmlrpc if REST is unavailable)
+WP_REST_URL = os.getenv('WP_REST_URL') or (WP_URL or '').rsplit('/xmlrpc.php', 1)[0].rstrip('/') + '/wp-json/wp/v2'
+WP_POOL_MAXSIZE = int(os.getenv('WP_POOL_MAXSIZE', 10))  # Max open REST connections
+WP_CONNECT_TIMEOUT = float(os.getenv('WP_CONNECT_TIMEOUT', 10))  # Seconds
+WP_READ_TIMEOUT = float(os.getenv('WP_READ_TIMEOUT', 120))  # Seconds (large uploads)
+POST_INDEX_PATH = os.getenv('POST_INDEX_PATH', 'post_index.sqlite3')  # Local mirror of published posts
+POST_SYNC_PAGE_SIZE = int(os.getenv('POST_SYNC_PAGE_SIZE', 100))
+WP_PAGE_SIZE = int(os.getenv('WP_PAGE_SIZE', 100))  # Posts per XML-RPC page for full listings
+WP_FETCH_WORKERS = int(os.getenv('WP_FETCH_WORKERS', 4))  # Parallel page fetches
+WP_MULTICALL_BATCH = int(os.getenv('WP_MULTICALL_BATCH', 10))  # Max calls per system.multicall request
+WP_UPLOAD_BATCH = int(os.getenv('WP_UPLOAD_BATCH', 2))  # Max images per upload request (each is base64 inside the XML body)
+WP_LINK_FLUSH_EVERY = int(os.getenv('WP_LINK_FLUSH_EVERY', 5))  # Published posts per batched permalink lookup
 
 # Pexels (Image)
 PEXELS_API_KEY = os.getenv('PEXELS_API_KEY')
+PEXELS_POOL_PATH = os.getenv('PEXELS_POOL_PATH', 'pexels_pool.sqlite3')  # Per-keyword photo reservoir
+PEXELS_PAGE_SIZE = 80  # Pexels maximum per_page
+IMAGE_SPOOL_THRESHOLD = 8 * 1024 * 1024  # Bytes kept in memory before spilling to a temp file
+MEDIA_INDEX_PATH = os.getenv('MEDIA_INDEX_PATH', 'media_index.sqlite3')  # Pexels photo -> WP attachment map
+IMAGE_TARGET_WIDTH = int(os.getenv('IMAGE_TARGET_WIDTH', 1600))  # Pixels; 0 keeps Pexels originals
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'webp')  # webp | jpeg | original
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 80))
+
+
+# Rate Limits (per provider, shared by all threads in the process)
+RATE_LIMITS = {
+    'openrouter': {
+        'rpm': float(os.getenv('OPENROUTER_RPM', 60)),
+        'tpm': float(os.getenv('OPENROUTER_TPM', 400000)),
+    },
+    'pexels': {'rpm': float(os.getenv('PEXELS_RPM', 200 / 60.0))},  # Pexels default: 200 req/hour
+    'google_trends': {'rpm': float(os.getenv('TRENDS_RPM', 12))},
+    'wordpress': {'rpm': float(os.getenv('WP_RPM', 120))},
+}
+
+# Publishing history (posted keywords/titles + activity log)
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', 'history.sqlite3')
+TITLE_DUP_THRESHOLD = float(os.getenv('TITLE_DUP_THRESHOLD', 0.6))  # Topic-word Jaccard at which a title counts as a near-duplicate
+
+# Background jobs (python -m auto_blog.jobs worker)
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', 'jobs.sqlite3')
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 2))  # Jobs run at once per worker process
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))  # Seconds between worker polls
+JOB_STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', 60))  # Seconds without heartbeat before a job is re-queued
+
+# Stage journal (resume interrupted posts without regenerating them)
+JOURNAL_DB_PATH = os.getenv('JOURNAL_DB_PATH', 'journal.sqlite3')
+JOURNAL_LEASE = float(os.getenv('JOURNAL_LEASE', 1800))  # Seconds before an idle item held by another run can be taken over
+JOURNAL_MAX_ATTEMPTS = int(os.getenv('JOURNAL_MAX_ATTEMPTS', 3))  # Runs that may pick up the same item before it is given up
+JOURNAL_KEEP_DAYS = float(os.getenv('JOURNAL_KEEP_DAYS', 7))  # Finished items are pruned after this many days
 
+# Mass Automation Pipeline (workers per stage, queue size between stages)
+MASS_WRITE_WORKERS = int(os.getenv('MASS_WRITE_WORKERS', 3))
+MASS_MEDIA_WORKERS = int(os.getenv('MASS_MEDIA_WORKERS', 2))
+MASS_PUBLISH_WORKERS = int(os.getenv('MASS_PUBLISH_WORKERS', 1))
+MASS_QUEUE_SIZE = int(os.getenv('MASS_QUEUE_SIZE', 2))
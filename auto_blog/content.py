@@ -1,72 +1,76 @@
-import requests
-import json
 import time
-import random
-from .config import OPENROUTER_API_KEY, GEMINI_MODEL, SITE_URL, SITE_NAME
+import json
+import hashlib
+import threading
+from .config import (
+    GEMINI_MODEL,
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_DEFAULT_TTL,
+)
+from .llm import get_llm_client, run_bounded
+from .cache import DiskCache
+from .ratelimit import with_rate_limit, get_limiter, status_from_exception
 
-def retry_with_backoff(func):
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
     """
-    Decorator to handle rate limits (429) and server errors.
+    Returns the shared on-disk LLM response cache.
     """
-    def wrapper(*args, **kwargs):
-        attempts = 0
-        max_attempts = 5
-        delay = 10 
-        
-        while attempts < max_attempts:
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                error_str = str(e)
-                if "429" in error_str or "500" in error_str or "502" in error_str:
-                    print(f"API Error ({error_str}). Retrying in {delay}s...")
-                    time.sleep(delay)
-                    delay *= 2 
-                    attempts += 1
-                else:
-                    raise e
-        print("Max retries exceeded.")
-        return None
-    return wrapper
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = DiskCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+    return _llm_cache
+
+def llm_cache_key(prompt, reasoning_enabled=False, model=GEMINI_MODEL):
+    raw = f"{model}\0{int(bool(reasoning_enabled))}\0{prompt}"
+    return "llm:" + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def estimate_tokens(prompt, *args, **kwargs):
+    # ~4 chars per token plus headroom for the completion
+    return len(prompt) // 4 + 1000
+
+@with_rate_limit('openrouter', base_delay=10, max_delay=160, cost=estimate_tokens, reraise=False)
+def _query_llm_uncached(prompt, reasoning_enabled=False):
+    return get_llm_client().complete(prompt, reasoning_enabled=reasoning_enabled)
 
-@retry_with_backoff
-def query_llm(prompt, reasoning_enabled=False):
+def query_llm(prompt, reasoning_enabled=False, use_cache=True, cache_ttl=LLM_CACHE_DEFAULT_TTL):
     """
     Sends a prompt to OpenRouter and returns the text response.
     Supports reasoning if enabled.
+    Uses the shared pooled client (see llm.get_llm_client).
+    Identical prompts are served from the on-disk cache for cache_ttl seconds;
+    pass use_cache=False for calls that must always be fresh.
     """
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": SITE_URL, 
-        "X-Title": SITE_NAME, 
-    }
-    data = {
-        "model": GEMINI_MODEL,
-        "messages": [
-            {"role": "user", "content": prompt}
-        ]
-    }
-    
-    if reasoning_enabled:
-        data["reasoning"] = {"enabled": True}
-    
-    response = requests.post(url, headers=headers, data=json.dumps(data))
-    
-    if response.status_code != 200:
-        raise Exception(f"OpenRouter Error {response.status_code}: {response.text}")
-        
-    json_response = response.json()
-    if 'choices' in json_response and len(json_response['choices']) > 0:
-        return json_response['choices'][0]['message']['content']
-    else:
-        return ""
+    if not (use_cache and LLM_CACHE_ENABLED):
+        return _query_llm_uncached(prompt, reasoning_enabled)
+
+    cache = get_llm_cache()
+    key = llm_cache_key(prompt, reasoning_enabled)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    text = _query_llm_uncached(prompt, reasoning_enabled)
+    if text:
+        cache.set(key, text, ttl=cache_ttl)
+    return text
 
-def generate_titles(keyword, count=5):
+async def aquery_llm(prompt, reasoning_enabled=False, use_cache=True, cache_ttl=LLM_CACHE_DEFAULT_TTL):
+    """
+    Async counterpart of query_llm.
+    Many calls can be awaited together (e.g. with asyncio.gather); at most
+    LLM_MAX_CONCURRENCY are in flight at once.
+    """
+    return await run_bounded(query_llm, prompt, reasoning_enabled, use_cache, cache_ttl)
+
+def generate_titles(keyword, count=5, fresh=False):
     """
     Generates a list of catchy blog titles for a keyword.
     Enforces INFORMATIONAL framing (How-to, Guides, etc.).
+    fresh=True skips the response cache (use when more/new titles are wanted).
     """
     prompt = f"""
     Generate {count} catchy, SEO-friendly, and viral blog post titles for the keyword: "{keyword}".
@@ -76,14 +80,89 @@ def generate_titles(keyword, count=5):
     
     Return ONLY the titles, one per line. No numbers or bullets.
     """
-    text = query_llm(prompt)
+    text = query_llm(prompt, use_cache=not fresh, cache_ttl=24 * 3600)
     if not text: return []
     return [line.strip() for line in text.split('\n') if line.strip()]
 
-def generate_blog_post(topic, sub_niche, internal_links=None):
+def generate_titles_batch(keywords, count=5, chunk_size=10, fresh=False, progress=None):
+    """
+    Generates titles for many keywords with one LLM call per chunk_size keywords.
+    Returns {keyword: [titles]}. Keywords missing from a response fall back to
+    single-keyword generate_titles calls.
+    progress: optional callback(done, total) after each keyword set is resolved.
+    """
+    results = {}
+    total = len(keywords)
+    for i in range(0, total, chunk_size):
+        chunk = keywords[i:i+chunk_size]
+        keyword_lines = "\n".join(f"- {kw}" for kw in chunk)
+        prompt = f"""
+    Generate {count} catchy, SEO-friendly, and viral blog post titles for EACH of these keywords:
+    {keyword_lines}
+
+    IMPORTANT: Format these as INFORMATIONAL content (e.g., "How to...", "Ultimate Guide to...", "X Tips for...", "Why you should...").
+    Avoid purely commercial titles (like "Buy X" or "X Service").
+
+    Return ONLY a JSON object mapping each keyword (exactly as written above) to a list of {count} title strings.
+    Example: {{"keyword one": ["Title 1", "Title 2"], "keyword two": ["Title 1", "Title 2"]}}
+    """
+        text = query_llm(prompt, use_cache=not fresh, cache_ttl=24 * 3600)
+        parsed = parse_titles_map(text, chunk)
+        results.update(parsed)
+        if progress: progress(len(results), total)
+
+    # Per-keyword fallback only for what the batch call missed
+    missing = [kw for kw in keywords if kw not in results]
+    done = total - len(missing)
+    for kw in missing:
+        titles = generate_titles(kw, count=count, fresh=fresh)
+        if titles:
+            results[kw] = titles
+        done += 1
+        if progress: progress(done, total)
+    return results
+
+def parse_titles_map(text, keywords):
+    """
+    Parses a {keyword: [titles]} JSON response, tolerating code fences,
+    surrounding prose and small differences in keyword case/spacing.
+    """
+    if not text: return {}
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    if start == -1 or end == 0:
+        return {}
+    try:
+        data = json.loads(text[start:end], strict=False)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    wanted = {_normalize_key(kw): kw for kw in keywords}
+    results = {}
+    for key, titles in data.items():
+        kw = wanted.get(_normalize_key(key))
+        if kw is None:
+            continue
+        if isinstance(titles, str):
+            titles = titles.split('\n')
+        if not isinstance(titles, list):
+            continue
+        clean = [str(t).strip() for t in titles if str(t).strip()]
+        if clean:
+            results[kw] = clean
+    return results
+
+def _normalize_key(text):
+    return " ".join(str(text).lower().split())
+
+def generate_blog_post(topic, sub_niche, internal_links=None, on_section=None):
     """
     Generates a blog post using OpenRouter with strict validation rules.
     internal_links: list of dicts [{'title': '...', 'link': '...'}]
+    on_section: optional callback(name, value) fired as each section finishes streaming.
+    The returned dict also carries 'ttft' (time to first token) and 'generation_time'.
     """
     
     links_prompt = ""
@@ -128,48 +207,174 @@ def generate_blog_post(topic, sub_niche, internal_links=None):
     """
     
     # Enable reasoning for complex content generation
-    text = query_llm(prompt, reasoning_enabled=True)
-    if not text: return None
-    
-    # Parse the response
-    title = ""
-    meta_title = ""
-    meta_desc = ""
-    content_body = ""
-    tags = ""
-    excerpt = ""
-    
-    lines = text.split('\n')
-    current_section = None
-    
-    for line in lines:
-        if line.startswith("TITLE:"):
-            title = line.replace("TITLE:", "").strip()
-        elif line.startswith("META TITLE:"):
-            meta_title = line.replace("META TITLE:", "").strip()
-        elif line.startswith("META DESCRIPTION:"):
-            meta_desc = line.replace("META DESCRIPTION:", "").strip()
-        elif line.startswith("CONTENT:"):
-            current_section = "CONTENT"
+    # Blog bodies must always be fresh, never served from cache
+    parser = BlogPostStreamParser(on_section=on_section)
+    try:
+        for chunk in stream_llm(prompt, reasoning_enabled=True):
+            parser.feed(chunk)
+    except Exception as e:
+        if parser.first_token_at is not None:
+            print(f"Stream interrupted after first token: {e}")
+            return None
+        if status_from_exception(e) == 429:
+            # Already retried with the limiter paused; a regular request would hit the same limit
+            print(f"Streaming rate limited ({e}), giving up on this post")
+            return None
+        # Nothing arrived yet: fall back to a regular (retried) request
+        print(f"Streaming failed ({e}), falling back to a regular request...")
+        text = query_llm(prompt, reasoning_enabled=True, use_cache=False)
+        if not text: return None
+        parser.feed(text)
+
+    post = parser.finish()
+    if not post['content'] and not post['title']:
+        return None
+
+    if not post['title']: post['title'] = topic # Fallback
+    return post
+
+@with_rate_limit('openrouter', base_delay=10, max_delay=160, cost=estimate_tokens)
+def _open_stream(prompt, reasoning_enabled=False):
+    # Waits for the first chunk, so a 429/5xx/timeout before any output is
+    # retried (and pauses the limiter) exactly like _query_llm_uncached
+    chunks = get_llm_client().stream(prompt, reasoning_enabled=reasoning_enabled)
+    return next(chunks, None), chunks
+
+def stream_llm(prompt, reasoning_enabled=False):
+    """
+    Streams an OpenRouter completion, yielding text chunks as they arrive.
+    Never cached. Connecting goes through the shared OpenRouter limiter with
+    query_llm's retries; a rate-limit error mid-stream pauses the limiter too.
+    """
+    first, chunks = _open_stream(prompt, reasoning_enabled)
+    if first is None:
+        return
+    yield first
+    try:
+        yield from chunks
+    except Exception as e:
+        if status_from_exception(e) == 429:
+            get_limiter('openrouter').penalize(getattr(e, 'retry_after', None) or 10)
+        raise
+
+class BlogPostStreamParser:
+    """
+    Incremental parser for the TITLE / META TITLE / META DESCRIPTION / CONTENT /
+    TAGS / excerpt response format.
+    Feed it text chunks as they stream in; on_section(name, value) is called as
+    soon as each section is complete (e.g. 'title' long before the body finishes).
+    """
+    LINE_FIELDS = [
+        ("TITLE:", "title"),
+        ("META TITLE:", "meta_title"),
+        ("META DESCRIPTION:", "meta_desc"),
+    ]
+
+    def __init__(self, on_section=None):
+        self.on_section = on_section
+        self.started_at = time.time()
+        self.first_token_at = None
+        self.result = {
+            "title": "",
+            "meta_title": "",
+            "meta_desc": "",
+            "content": "",
+            "tags": "",
+            "excerpt": ""
+        }
+        self._buffer = ""
+        self._content_lines = []
+        self._current_section = None
+
+    @property
+    def ttft(self):
+        """
+        Time to first token in seconds (None until something arrives).
+        """
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.time()
+        self._buffer += chunk
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            self._process_line(line)
+
+    def finish(self):
+        """
+        Flushes the last partial line and returns the parsed post dict.
+        """
+        if self._buffer:
+            self._process_line(self._buffer)
+            self._buffer = ""
+        if self._current_section == "CONTENT":
+            self._close_content()
+        self.result["ttft"] = self.ttft
+        self.result["generation_time"] = time.time() - self.started_at
+        return self.result
+
+    def _process_line(self, line):
+        for prefix, key in self.LINE_FIELDS:
+            if line.startswith(prefix):
+                self._emit(key, line.replace(prefix, "").strip())
+                return
+        if line.startswith("CONTENT:"):
+            self._current_section = "CONTENT"
         elif line.startswith("TAGS:"):
-            current_section = None
-            tags = line.replace("TAGS:", "").strip()
+            self._close_content()
+            self._emit("tags", line.replace("TAGS:", "").strip())
         elif line.startswith("excerpt:"):
-            current_section = None
-            excerpt = line.replace("excerpt:", "").strip()
-        elif current_section == "CONTENT":
-            content_body += line + "\n"
-    
-    if not title: title = topic # Fallback
-    
-    return {
-        "title": title,
-        "meta_title": meta_title,
-        "meta_desc": meta_desc,
-        "content": content_body.strip(),
-        "tags": tags,
-        "excerpt": excerpt
-    }
+            self._close_content()
+            self._emit("excerpt", line.replace("excerpt:", "").strip())
+        elif self._current_section == "CONTENT":
+            self._content_lines.append(line)
+
+    def _close_content(self):
+        if self._current_section == "CONTENT":
+            self._current_section = None
+            self._emit("content", "\n".join(self._content_lines).strip())
+
+    def _emit(self, key, value):
+        self.result[key] = value
+        if self.on_section:
+            self.on_section(key, value)
+
+def inject_images(content, uploaded_imgs, title):
+    """
+    Places the 2nd/3rd uploaded images after the 1st and 3rd </h2> headings
+    (the 1st image is used as the featured image).
+    """
+    if len(uploaded_imgs) <= 1:
+        return content
+    parts = content.split('</h2>')
+    new_c = ""
+    e_idx = 1
+    for i, part in enumerate(parts):
+        new_c += part
+        if i < len(parts) - 1: new_c += "</h2>"
+        if (i == 0 or i == 2) and e_idx < len(uploaded_imgs):
+            u = uploaded_imgs[e_idx]['url']
+            new_c += f'<figure><img src="{u}" alt="{title}" style="width:100%; border-radius:10px; margin:20px 0;" /><figcaption>{title}</figcaption></figure>'
+            e_idx += 1
+    return new_c
+
+def build_seo_fields(post_data):
+    """
+    Yoast / RankMath custom fields for the generated meta title and description.
+    """
+    custom_fields = []
+    if post_data.get('meta_title'):
+        custom_fields.append({'key': '_yoast_wpseo_title', 'value': post_data['meta_title']})
+        custom_fields.append({'key': 'rank_math_title', 'value': post_data['meta_title']})
+    if post_data.get('meta_desc'):
+        custom_fields.append({'key': '_yoast_wpseo_metadesc', 'value': post_data['meta_desc']})
+        custom_fields.append({'key': 'rank_math_description', 'value': post_data['meta_desc']})
+    return custom_fields
 
 def validate_post_structure(post_data):
     """
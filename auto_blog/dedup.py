@@ -0,0 +1,101 @@
+import random
+import hashlib
+import threading
+from .config import TITLE_DUP_THRESHOLD
+from .linking import tokenize
+
+# Title filler that says nothing about the topic ("10 Easy Ways to ...")
+FILLER = {
+    'best', 'top', 'easy', 'simple', 'ultimate', 'complete', 'guide', 'tip', 'way', 'step',
+    'make', 'making', 'need', 'know', 'everything', 'beginner', 'expert', 'proven', 'essential',
+    'secret', 'quick', 'great', 'amazing', 'really', 'actually', 'should', 'must', 'more', 'most',
+    'about', 'into', 'without', 'using', 'use', 'get', 'new', 'all', 'every', 'year',
+}
+
+_PRIME = (1 << 61) - 1
+
+def title_terms(title):
+    """
+    The set of topic words in a title, used as its MinHash shingles.
+    """
+    return frozenset(t for t in tokenize(title) if t not in FILLER and not t.isdigit())
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _choose_bands(threshold, num_perm):
+    # Bands b x rows r with the LSH "S-curve" knee (1/b)^(1/r) just below the
+    # threshold: candidates are verified exactly, so favour recall
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        knee = (1.0 / bands) ** (1.0 / rows)
+        if knee <= threshold * 0.9 and (best is None or knee > best[0]):
+            best = (knee, bands, rows)
+    return (best[1], best[2]) if best else (num_perm, 1)
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH over title topic words. find() only compares a new title
+    with titles that share an LSH band bucket, then checks the exact Jaccard
+    similarity, so lookups stay well under a millisecond as the index grows.
+    Titles can be added at any time (thread-safe).
+    """
+    def __init__(self, titles=None, threshold=TITLE_DUP_THRESHOLD, num_perm=64, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = _choose_bands(threshold, num_perm)
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._buckets = [{} for _ in range(self.bands)]  # band -> {band signature: [doc ids]}
+        self._docs = []  # (title, terms)
+        self._lock = threading.Lock()
+        for title in titles or []:
+            self.add(title)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _signature(self, terms):
+        hashes = [int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest(), 'big') for t in terms]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, signature):
+        return [tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def add(self, title):
+        terms = title_terms(title)
+        if not terms:
+            return
+        keys = self._band_keys(self._signature(terms))
+        with self._lock:
+            doc_id = len(self._docs)
+            self._docs.append((title, terms))
+            for band, key in zip(self._buckets, keys):
+                band.setdefault(key, []).append(doc_id)
+
+    def find(self, title, threshold=None):
+        """
+        Returns (existing title, similarity) for the closest indexed title at
+        or above the threshold, or None.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        terms = title_terms(title)
+        if not terms:
+            return None
+        keys = self._band_keys(self._signature(terms))
+        with self._lock:
+            candidates = set()
+            for band, key in zip(self._buckets, keys):
+                candidates.update(band.get(key, ()))
+            best = None
+            for doc_id in candidates:
+                existing, existing_terms = self._docs[doc_id]
+                score = jaccard(terms, existing_terms)
+                if score >= threshold and (best is None or score > best[1]):
+                    best = (existing, score)
+        return best
@@ -0,0 +1,293 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import datetime
+import threading
+import collections
+from .config import HISTORY_DB_PATH
+
+# Legacy append-only files, imported once into the store
+LEGACY_KEYWORDS_FILE = "posted_keywords.txt"
+LEGACY_TITLES_FILE = "posted_titles.txt"
+LEGACY_LOG_FILE = "post_history.json"
+
+def normalize_title(title):
+    """
+    Case/punctuation-insensitive form used for duplicate checks.
+    """
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', (title or '').lower())).strip()
+
+class HistoryStore:
+    """
+    Publishing history in one SQLite database (WAL): posted keywords, posted
+    titles and the activity log shown on the dashboard.
+    Threads share one connection behind a lock; other processes open their
+    own connection and WAL + busy timeout serialize their writes.
+    """
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS keywords (
+                    keyword TEXT PRIMARY KEY,
+                    posted_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS titles (
+                    title TEXT PRIMARY KEY,
+                    normalized TEXT NOT NULL,
+                    keyword TEXT,
+                    posted_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT,
+                    keyword TEXT,
+                    status TEXT,
+                    timestamp TEXT NOT NULL,
+                    data TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_titles_normalized ON titles(normalized)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_titles_keyword ON titles(keyword)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_title ON events(title)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _read(self, sql, args=()):
+        with self._lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def _write(self, sql, args=()):
+        with self._lock:
+            with self.conn:
+                return self.conn.execute(sql, args)
+
+    # --- Keywords ---
+    def has_keyword(self, keyword):
+        return bool(self._read("SELECT 1 FROM keywords WHERE keyword = ?", (keyword,)))
+
+    def add_keyword(self, keyword):
+        self._write("INSERT OR IGNORE INTO keywords (keyword, posted_at) VALUES (?, ?)", (keyword, time.time()))
+
+    def keywords(self):
+        return set(r[0] for r in self._read("SELECT keyword FROM keywords"))
+
+    # --- Titles ---
+    def has_title(self, title):
+        """
+        True if this title (ignoring case and punctuation) was already posted.
+        """
+        return bool(self._read("SELECT 1 FROM titles WHERE normalized = ? LIMIT 1", (normalize_title(title),)))
+
+    def add_title(self, title, keyword=None):
+        self._write(
+            "INSERT OR IGNORE INTO titles (title, normalized, keyword, posted_at) VALUES (?, ?, ?, ?)",
+            (title, normalize_title(title), keyword, time.time())
+        )
+
+    def titles(self):
+        return set(r[0] for r in self._read("SELECT title FROM titles"))
+
+    # --- Activity log ---
+    def log_event(self, entry):
+        """
+        Appends an activity entry ({'title', 'status', 'timestamp', ...});
+        anything beyond the indexed columns is kept as JSON. Returns its id.
+        """
+        entry = dict(entry)
+        timestamp = entry.pop('timestamp', None) or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor = self._write(
+            "INSERT INTO events (title, keyword, status, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+            (entry.pop('title', None), entry.pop('keyword', None), entry.pop('status', None), timestamp, json.dumps(entry))
+        )
+        return cursor.lastrowid
+
+    def events(self, after_id=0, limit=None):
+        """
+        Activity entries with id > after_id, oldest first, as the dicts
+        originally logged (plus 'id').
+        """
+        sql = "SELECT id, title, keyword, status, timestamp, data FROM events WHERE id > ? ORDER BY id"
+        args = (after_id,)
+        if limit:
+            sql += " LIMIT ?"
+            args += (limit,)
+        return [_event(row) for row in self._read(sql, args)]
+
+    def recent_events(self, offset=0, limit=50):
+        """
+        One page of activity entries, newest first.
+        """
+        rows = self._read(
+            "SELECT id, title, keyword, status, timestamp, data FROM events ORDER BY id DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        )
+        return [_event(row) for row in rows]
+
+    def count_events(self, status=None):
+        if status is None:
+            return self._read("SELECT COUNT(*) FROM events")[0][0]
+        return self._read("SELECT COUNT(*) FROM events WHERE status = ?", (status,))[0][0]
+
+    def events_per_day(self, status=None):
+        """
+        [(YYYY-MM-DD, count)] oldest first.
+        """
+        sql = "SELECT substr(timestamp, 1, 10) AS day, COUNT(*) FROM events"
+        args = ()
+        if status is not None:
+            sql += " WHERE status = ?"
+            args = (status,)
+        return self._read(sql + " GROUP BY day ORDER BY day", args)
+
+    # --- Meta / import ---
+    def get_meta(self, key):
+        rows = self._read("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, key, value):
+        self._write("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def import_legacy(self, keywords_file=LEGACY_KEYWORDS_FILE, titles_file=LEGACY_TITLES_FILE,
+                      log_file=LEGACY_LOG_FILE, force=False):
+        """
+        One-shot import of the old text/JSON-lines history files.
+        Returns (keywords, titles, events) imported; (0, 0, 0) if already done.
+        """
+        if self.get_meta('legacy_imported') and not force:
+            return (0, 0, 0)
+        now = time.time()
+        keywords = _read_lines(keywords_file)
+        titles = _read_lines(titles_file)
+        events = []
+        for line in _read_lines(log_file):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            timestamp = entry.pop('timestamp', '') or ''
+            events.append((entry.pop('title', None), entry.pop('keyword', None), entry.pop('status', None), timestamp, json.dumps(entry)))
+
+        with self._lock:
+            with self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO keywords (keyword, posted_at) VALUES (?, ?)", [(k, now) for k in keywords])
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO titles (title, normalized, keyword, posted_at) VALUES (?, ?, NULL, ?)",
+                    [(t, normalize_title(t), now) for t in titles]
+                )
+                # Skip entries already present, so a forced re-import doesn't duplicate the log
+                self.conn.executemany("""
+                    INSERT INTO events (title, keyword, status, timestamp, data)
+                    SELECT ?1, ?2, ?3, ?4, ?5
+                    WHERE NOT EXISTS (SELECT 1 FROM events WHERE title IS ?1 AND timestamp = ?4)
+                """, events)
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(now),))
+        return (len(keywords), len(titles), len(events))
+
+
+class ActivitySummary:
+    """
+    Running dashboard aggregates (posts per day, validation pass rates,
+    images per post) over the activity log. refresh() only reads events
+    newer than the last one it saw, so keeping it current costs one indexed
+    query per render however long the history gets.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.last_id = 0
+        self.total = 0
+        self.by_status = collections.Counter()
+        self.per_day = collections.Counter()
+        self.checks = {}  # check name -> [passed, seen]
+        self.images = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, batch_size=1000):
+        """
+        Folds in events logged since the last refresh; returns how many.
+        """
+        with self._lock:
+            added = 0
+            while True:
+                batch = self.store.events(after_id=self.last_id, limit=batch_size)
+                for entry in batch:
+                    self._add(entry)
+                added += len(batch)
+                if len(batch) < batch_size:
+                    return added
+
+    def _add(self, entry):
+        self.last_id = entry['id']
+        self.total += 1
+        self.by_status[entry.get('status') or 'Unknown'] += 1
+        self.per_day[(entry.get('timestamp') or '')[:10]] += 1
+        for name, passed in (entry.get('validations') or {}).items():
+            counts = self.checks.setdefault(name, [0, 0])
+            counts[0] += 1 if passed else 0
+            counts[1] += 1
+        self.images += entry.get('images') or 0
+
+    def pass_rates(self):
+        with self._lock:
+            return {name: passed / seen for name, (passed, seen) in self.checks.items() if seen}
+
+    def images_per_post(self):
+        with self._lock:
+            return self.images / self.total if self.total else 0.0
+
+    def daily_counts(self, days=30):
+        """
+        [(YYYY-MM-DD, count)] for the most recent days with activity, oldest first.
+        """
+        with self._lock:
+            return sorted(self.per_day.items())[-days:]
+
+
+def _event(row):
+    entry = json.loads(row[5]) if row[5] else {}
+    entry.update({'id': row[0], 'title': row[1], 'keyword': row[2], 'status': row[3], 'timestamp': row[4]})
+    return entry
+
+def _read_lines(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_history_store():
+    """
+    The shared store; the first call in a fresh database imports the legacy files.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = HistoryStore()
+                imported = store.import_legacy()
+                if any(imported):
+                    print(f"Imported legacy history: {imported[0]} keywords, {imported[1]} titles, {imported[2]} log entries")
+                _store = store
+    return _store
+
+if __name__ == "__main__":
+    # python -m auto_blog.history import   (re-run the legacy import)
+    if len(sys.argv) > 1 and sys.argv[1] == 'import':
+        print(HistoryStore().import_legacy(force=True))
+    else:
+        store = get_history_store()
+        print({'keywords': len(store.keywords()), 'titles': len(store.titles()), 'events': store.count_events()})
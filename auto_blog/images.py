@@ -1,19 +1,54 @@
+import os
+import re
+import json
+import time
+import sqlite3
 import requests
 import random
-from .config import PEXELS_API_KEY
+import mimetypes
+import tempfile
+import threading
+import concurrent.futures
+from urllib.parse import urlparse
 
-def get_images(query, count=1):
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional: without it images are only resized by the Pexels CDN
+    Image = None
+from .config import (
+    PEXELS_API_KEY, IMAGE_SPOOL_THRESHOLD, PEXELS_POOL_PATH, PEXELS_PAGE_SIZE,
+    IMAGE_TARGET_WIDTH, IMAGE_FORMAT, IMAGE_QUALITY,
+)
+from .ratelimit import APIError, get_limiter, with_rate_limit
+
+PEXELS_SEARCH_URL = "https://api.pexels.com/v1/search"
+REFILL_LOCK_STRIPES = 16  # Pools refilling at once share one of these locks by key hash
+PHOTO_RESERVE_TTL = 3600  # Seconds a handed-out photo stays reserved if it is never marked used or released
+
+@with_rate_limit('pexels')
+def pexels_search(params):
     """
-    Searches Pexels and returns a list of image URLs.
+    Calls the Pexels search API through the shared rate limiter.
+    Returns the decoded JSON response.
+    """
+    headers = {
+        "Authorization": PEXELS_API_KEY
+    }
+    response = requests.get(PEXELS_SEARCH_URL, headers=headers, params=params, timeout=(10, 30))
+    get_limiter('pexels').update_from_headers(response.headers)
+    if response.status_code != 200:
+        raise APIError.from_response("Pexels Error", response)
+    return response.json()
+
+def search_photos(query, count=1):
+    """
+    Searches Pexels and returns up to count photos as dicts:
+    {'id': ..., 'url': ..., 'alt': ...}
     """
     if not PEXELS_API_KEY:
         print("Pexels API Key is missing.")
         return []
 
-    url = "https://api.pexels.com/v1/search"
-    headers = {
-        "Authorization": PEXELS_API_KEY
-    }
     # Request more than needed to ensure uniqueness/randomness
     per_page = max(5, count * 2)
     params = {
@@ -23,19 +58,13 @@ def get_images(query, count=1):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = pexels_search(params)
         
         if data['photos']:
             # Shuffle and pick 'count' unique photos
             photos = data['photos']
             random.shuffle(photos)
-            
-            urls = []
-            for p in photos[:count]:
-                urls.append(p['src']['original']) # or 'large'
-            return urls
+            return [photo_info(p) for p in photos[:count]]
         else:
             print(f"No images found for {query}")
             return []
@@ -44,6 +73,231 @@ def get_images(query, count=1):
         print(f"Error fetching images for {query}: {e}")
         return []
 
+def photo_info(p, target_width=IMAGE_TARGET_WIDTH):
+    return {
+        'id': str(p['id']),
+        'url': pick_variant_url(p, target_width),
+        'alt': p.get('alt') or '',
+    }
+
+def pick_variant_url(p, target_width=IMAGE_TARGET_WIDTH):
+    """
+    Smallest Pexels rendition that is still at least target_width wide.
+    The Pexels CDN resizes on the fly when w= is appended to the original URL,
+    so a 6000px / 10 MB original comes down as a ~1600px compressed JPEG.
+    """
+    original = p['src']['original']
+    width = p.get('width') or 0
+    if not target_width or (width and width <= target_width):
+        return original
+    return f"{original}?auto=compress&cs=tinysrgb&w={target_width}"
+
+def get_images(query, count=1):
+    """
+    Searches Pexels and returns a list of image URLs.
+    """
+    return [p['url'] for p in search_photos(query, count)]
+
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'for', 'to', 'of', 'in', 'on', 'with', 'your', 'you',
+    'how', 'why', 'what', 'best', 'guide', 'ultimate', 'complete', 'tips', 'ways', 'easy',
+    'step', 'by', 'is', 'are', 'will', 'can', 'that', 'this', 'from', 'at', 'it', 'make',
+}
+
+def reservoir_key(text):
+    """
+    Normalizes a keyword or title into a pool key, so similar titles share
+    one pool ("How to Make Homemade Organic Fertilizer" ~ "homemade organic fertilizer").
+    """
+    words = re.findall(r"[a-z]+", (text or '').lower())
+    content = [w for w in words if w not in STOPWORDS and len(w) > 2]
+    return " ".join(sorted(set(content[:6]))) or (text or '').strip().lower()
+
+class PhotoReservoir:
+    """
+    Pooled Pexels search: fetches big pages (up to 80 photos) per query,
+    stores them on disk, and hands out photos no post has used yet.
+    The next page is only requested when a pool runs dry, so one search
+    API call covers many posts.
+    Photos handed out by take() are only reserved (in memory); mark_used()
+    once they are in WordPress, or release() them, so a failed upload
+    doesn't use up good photos.
+    """
+    def __init__(self, path=PEXELS_POOL_PATH, page_size=PEXELS_PAGE_SIZE):
+        self.page_size = page_size
+        self.api_calls = 0
+        self.photos_served = 0
+        self._lock = threading.Lock()
+        self._refill_locks = [threading.Lock() for _ in range(REFILL_LOCK_STRIPES)]
+        self._reserved = {}  # photo id -> reserved at
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pools (
+                pool_key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                next_page INTEGER NOT NULL DEFAULT 1,
+                exhausted INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS pool_photos (
+                pool_key TEXT NOT NULL,
+                photo_id TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                info TEXT NOT NULL,
+                PRIMARY KEY (pool_key, photo_id)
+            );
+            CREATE TABLE IF NOT EXISTS used_photos (
+                photo_id TEXT PRIMARY KEY,
+                used_at REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def take(self, query, count=1):
+        """
+        Returns up to count unused photo dicts (see photo_info) for the query.
+        If the pool and every further result page are used up, already-used
+        photos from the pool are recycled rather than returning nothing.
+        """
+        key = reservoir_key(query)
+        photos = self._claim(key, count)
+        if len(photos) < count and self._refill(key, query):
+            photos += self._claim(key, count - len(photos))
+        if len(photos) < count:
+            photos += self._recycle(key, count - len(photos), {p['id'] for p in photos})
+        self.photos_served += len(photos)
+        return photos
+
+    def _unreserved(self, rows, now):
+        # Reservations nobody settled (the post failed before mark_used/release) lapse after PHOTO_RESERVE_TTL
+        for photo_id, reserved_at in list(self._reserved.items()):
+            if now - reserved_at > PHOTO_RESERVE_TTL:
+                del self._reserved[photo_id]
+        return [(photo_id, info) for photo_id, info in rows if photo_id not in self._reserved]
+
+    def _claim(self, key, count):
+        now = time.time()
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT photo_id, info FROM pool_photos
+                WHERE pool_key = ? AND photo_id NOT IN (SELECT photo_id FROM used_photos)
+                ORDER BY rank LIMIT ?
+            """, (key, count + len(self._reserved))).fetchall()
+            rows = self._unreserved(rows, now)[:count]
+            for photo_id, _ in rows:
+                self._reserved[photo_id] = now
+        return [json.loads(info) for _, info in rows]
+
+    def mark_used(self, photo_ids):
+        """
+        Records photos as used for good (they made it into WordPress).
+        """
+        now = time.time()
+        with self._lock:
+            for photo_id in photo_ids:
+                self._reserved.pop(photo_id, None)
+            self.conn.executemany("INSERT OR IGNORE INTO used_photos (photo_id, used_at) VALUES (?, ?)",
+                                  [(photo_id, now) for photo_id in photo_ids])
+            self.conn.commit()
+
+    def release(self, photo_ids):
+        """
+        Hands reserved photos back to their pool (their upload failed).
+        """
+        with self._lock:
+            for photo_id in photo_ids:
+                self._reserved.pop(photo_id, None)
+
+    def _recycle(self, key, count, exclude):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT photo_id, info FROM pool_photos WHERE pool_key = ? ORDER BY RANDOM() LIMIT ?",
+                (key, count + len(exclude))
+            ).fetchall()
+        return [json.loads(info) for photo_id, info in rows if photo_id not in exclude][:count]
+
+    def _refill(self, key, query):
+        """
+        Fetches the next result page for the pool. Returns True if new photos arrived.
+        """
+        with self._refill_locks[hash(key) % len(self._refill_locks)]:
+            with self._lock:
+                row = self.conn.execute("SELECT query, next_page, exhausted FROM pools WHERE pool_key = ?", (key,)).fetchone()
+                # Another worker may have refilled while we waited for the lock
+                unused = self.conn.execute("""
+                    SELECT photo_id, info FROM pool_photos
+                    WHERE pool_key = ? AND photo_id NOT IN (SELECT photo_id FROM used_photos)
+                    LIMIT ?
+                """, (key, len(self._reserved) + 1)).fetchall()
+                available = self._unreserved(unused, time.time())
+            if available:
+                return True
+            if row and row[2]:
+                return False
+            search_query, page = (row[0], row[1]) if row else (query, 1)
+
+            if not PEXELS_API_KEY:
+                print("Pexels API Key is missing.")
+                return False
+            try:
+                data = pexels_search({
+                    "query": search_query,
+                    "per_page": self.page_size,
+                    "page": page,
+                    "orientation": "landscape"
+                })
+                self.api_calls += 1
+            except Exception as e:
+                print(f"Error fetching images for {search_query}: {e}")
+                return False
+
+            photos = data.get('photos') or []
+            exhausted = 0 if data.get('next_page') and photos else 1
+            with self._lock:
+                self.conn.execute("""
+                    INSERT INTO pools (pool_key, query, next_page, exhausted, fetched_at) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(pool_key) DO UPDATE SET
+                        next_page = excluded.next_page, exhausted = excluded.exhausted, fetched_at = excluded.fetched_at
+                """, (key, search_query, page + 1, exhausted, time.time()))
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO pool_photos (pool_key, photo_id, rank, info) VALUES (?, ?, ?, ?)",
+                    [(key, str(p['id']), (page - 1) * self.page_size + i, json.dumps(photo_info(p)))
+                     for i, p in enumerate(photos)]
+                )
+                self.conn.commit()
+            if not photos:
+                print(f"No images found for {search_query}")
+            return bool(photos)
+
+    def stats(self):
+        with self._lock:
+            pools = self.conn.execute("SELECT COUNT(*) FROM pools").fetchone()[0]
+            pooled = self.conn.execute("SELECT COUNT(*) FROM pool_photos").fetchone()[0]
+            used = self.conn.execute("SELECT COUNT(*) FROM used_photos").fetchone()[0]
+            reserved = len(self._reserved)
+        return {'pools': pools, 'pooled': pooled, 'used': used, 'reserved': reserved,
+                'api_calls': self.api_calls, 'photos_served': self.photos_served}
+
+
+_reservoir = None
+_reservoir_lock = threading.Lock()
+
+def get_reservoir():
+    global _reservoir
+    if _reservoir is None:
+        with _reservoir_lock:
+            if _reservoir is None:
+                _reservoir = PhotoReservoir()
+    return _reservoir
+
+def take_photos(query, count=1):
+    """
+    Unused Pexels photos for a keyword/title from the shared reservoir
+    (reserved until media.upload_photos marks them used or releases them).
+    """
+    return get_reservoir().take(query, count)
+
 # Backwards compatibility alias
 def get_image_url(query):
     imgs = get_images(query, count=1)
@@ -64,6 +318,111 @@ def download_image(url, filename="temp_image.jpg"):
         print(f"Error downloading image: {e}")
         return None
 
+class ImageBuffer:
+    """
+    A downloaded image held in memory (spills to a temp file above
+    IMAGE_SPOOL_THRESHOLD bytes). Nothing is written to the working directory.
+    """
+    def __init__(self, name, mime_type, file, size):
+        self.name = name
+        self.mime_type = mime_type
+        self.file = file
+        self.size = size
+
+    def read(self):
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self):
+        self.file.close()
+
+def fetch_image(url, filename=None):
+    """
+    Downloads an image into an ImageBuffer. Returns None on failure.
+    """
+    try:
+        with requests.get(url, stream=True, timeout=(10, 60)) as response:
+            response.raise_for_status()
+            buf = tempfile.SpooledTemporaryFile(max_size=IMAGE_SPOOL_THRESHOLD)
+            size = 0
+            for chunk in response.iter_content(chunk_size=65536):
+                buf.write(chunk)
+                size += len(chunk)
+            mime_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+    except Exception as e:
+        print(f"Error downloading image: {e}")
+        return None
+
+    name = filename or os.path.basename(urlparse(url).path) or "image.jpg"
+    if not mime_type.startswith('image/'):
+        mime_type = mimetypes.guess_type(name)[0] or 'image/jpeg'
+    buf.seek(0)
+    return ImageBuffer(name, mime_type, buf, size)
+
+_stats = {'images': 0, 'bytes_in': 0, 'bytes_out': 0}
+_stats_lock = threading.Lock()
+
+def get_image_stats():
+    """
+    Totals for process_image in this process: images handled, bytes before and after, bytes saved.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+    return stats
+
+def process_image(image, target_width=IMAGE_TARGET_WIDTH, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    """
+    Downsizes an ImageBuffer to target_width, strips metadata and re-encodes
+    it as WebP (or quality-tuned JPEG). Returns a new ImageBuffer, or the
+    original one if Pillow is missing, fmt is 'original', or re-encoding
+    would not make the file smaller.
+    """
+    if Image is None or fmt == 'original':
+        return image
+    try:
+        image.file.seek(0)
+        with Image.open(image.file) as img:
+            img.load()
+            if target_width and img.width > target_width:
+                height = round(img.height * target_width / img.width)
+                img = img.resize((target_width, height), Image.LANCZOS)
+            out = tempfile.SpooledTemporaryFile(max_size=IMAGE_SPOOL_THRESHOLD)
+            # Saving without exif/icc_profile arguments drops the metadata
+            if fmt == 'webp':
+                img.save(out, format='WEBP', quality=quality, method=4)
+                mime_type, ext = 'image/webp', '.webp'
+            else:
+                img.convert('RGB').save(out, format='JPEG', quality=quality, optimize=True, progressive=True)
+                mime_type, ext = 'image/jpeg', '.jpg'
+    except Exception as e:
+        print(f"Image processing failed for {image.name}: {e}")
+        return image
+
+    size = out.tell()
+    with _stats_lock:
+        _stats['images'] += 1
+        _stats['bytes_in'] += image.size
+        _stats['bytes_out'] += min(size, image.size)
+    if size >= image.size:
+        out.close()
+        return image
+    out.seek(0)
+    image.close()
+    name = os.path.splitext(image.name)[0] + ext
+    return ImageBuffer(name, mime_type, out, size)
+
+def fetch_images(urls, workers=3):
+    """
+    Downloads several images concurrently. Returns ImageBuffers in the same
+    order as urls, skipping failed downloads.
+    """
+    if not urls:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(urls))) as executor:
+        results = list(executor.map(fetch_image, urls))
+    return [r for r in results if r is not None]
+
 if __name__ == "__main__":
     url = get_image_url("Vegan Food")
     print("Image URL:", url)
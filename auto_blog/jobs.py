@@ -0,0 +1,452 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import subprocess
+from .config import JOBS_DB_PATH, JOB_WORKER_CONCURRENCY, JOB_POLL_INTERVAL, JOB_STALE_AFTER
+
+# queued -> running <-> paused -> done | cancelled | failed
+ACTIVE_STATUSES = ('running', 'paused')
+FINAL_STATUSES = ('done', 'cancelled', 'failed')
+
+class JobStore:
+    """
+    SQLite-backed job queue shared by the Streamlit app (submits jobs, polls
+    status, sends pause/resume/cancel) and worker processes (claim and run
+    jobs). WAL + busy timeout make it safe for several processes at once.
+    """
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                pause_requested INTEGER NOT NULL DEFAULT 0,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                progress TEXT,
+                message TEXT,
+                error TEXT,
+                worker_id TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                event TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                pid INTEGER,
+                heartbeat_at REAL NOT NULL,
+                stats TEXT
+            )
+        """)
+        if 'stats' not in [row[1] for row in self.conn.execute("PRAGMA table_info(workers)")]:
+            self.conn.execute("ALTER TABLE workers ADD COLUMN stats TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events(job_id, id)")
+
+    def _read(self, sql, args=()):
+        with self._lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def _write(self, sql, args=()):
+        with self._lock:
+            return self.conn.execute(sql, args)
+
+    # --- App side ---
+    def submit(self, kind, params):
+        """
+        Queues a job; returns its id.
+        """
+        cursor = self._write(
+            "INSERT INTO jobs (kind, params, progress, created_at) VALUES (?, ?, ?, ?)",
+            (kind, json.dumps(params), json.dumps({}), time.time())
+        )
+        return cursor.lastrowid
+
+    def get(self, job_id):
+        rows = self._read(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+        return _job(rows[0]) if rows else None
+
+    def list(self, limit=20):
+        """
+        Most recent jobs first.
+        """
+        return [_job(r) for r in self._read(f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY id DESC LIMIT ?", (limit,))]
+
+    def pause(self, job_id):
+        self._write("UPDATE jobs SET pause_requested = 1 WHERE id = ?", (job_id,))
+
+    def resume(self, job_id):
+        self._write("UPDATE jobs SET pause_requested = 0 WHERE id = ?", (job_id,))
+
+    def cancel(self, job_id):
+        # A job nobody has picked up yet is cancelled right away
+        self._write(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+        self._write("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+
+    def events(self, job_id, after_id=0, limit=200):
+        """
+        [(event id, event dict)] logged by a job, oldest first.
+        """
+        rows = self._read(
+            "SELECT id, event FROM job_events WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (job_id, after_id, limit)
+        )
+        return [(r[0], json.loads(r[1])) for r in rows]
+
+    def tail(self, job_id, limit=5, event_type=None):
+        """
+        The job's last few events (only those of event_type, if given), oldest first.
+        """
+        sql = "SELECT event FROM job_events WHERE job_id = ?"
+        args = (job_id,)
+        if event_type is not None:
+            sql += " AND json_extract(event, '$.type') = ?"
+            args += (event_type,)
+        rows = self._read(sql + " ORDER BY id DESC LIMIT ?", args + (limit,))
+        return [json.loads(r[0]) for r in reversed(rows)]
+
+    def live_workers(self, max_age=JOB_STALE_AFTER):
+        return self._read("SELECT worker_id, pid FROM workers WHERE heartbeat_at > ?", (time.time() - max_age,))
+
+    def worker_stats(self, max_age=JOB_STALE_AFTER):
+        """
+        runtime_stats() of each live worker, as of its last heartbeat.
+        """
+        rows = self._read(
+            "SELECT stats FROM workers WHERE heartbeat_at > ? AND stats IS NOT NULL", (time.time() - max_age,)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    # --- Worker side ---
+    def claim(self, worker_id):
+        """
+        Atomically takes the oldest queued job for this worker (None if none).
+        Jobs whose worker stopped sending heartbeats are queued again first.
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("""
+                    UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END,
+                        worker_id = NULL
+                    WHERE status IN ('running', 'paused') AND heartbeat_at < ?
+                """, (now - JOB_STALE_AFTER,))
+                row = self.conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute("""
+                        UPDATE jobs SET status = 'running', worker_id = ?, started_at = COALESCE(started_at, ?),
+                            heartbeat_at = ?
+                        WHERE id = ?
+                    """, (worker_id, now, now, row[0]))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return _job(row) if row is not None else None
+
+    def controls(self, job_id):
+        """
+        (pause requested, cancel requested) for a running job.
+        """
+        rows = self._read("SELECT pause_requested, cancel_requested FROM jobs WHERE id = ?", (job_id,))
+        return (bool(rows[0][0]), bool(rows[0][1])) if rows else (False, True)
+
+    def set_status(self, job_id, status):
+        self._write("UPDATE jobs SET status = ? WHERE id = ? AND status IN ('running', 'paused')", (status, job_id))
+
+    def record(self, job_id, event, progress=None, message=None):
+        """
+        Appends an event and (optionally) updates the job's progress/message.
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT INTO job_events (job_id, created_at, event) VALUES (?, ?, ?)",
+                    (job_id, now, json.dumps(event, default=str))
+                )
+                if progress is not None:
+                    self.conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+                if message is not None:
+                    self.conn.execute("UPDATE jobs SET message = ? WHERE id = ?", (message, job_id))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def finish(self, job_id, worker_id, status, error=None):
+        """
+        Final status for a job, if worker_id still holds it (a job re-queued
+        after a stale heartbeat may already belong to another worker).
+        """
+        self._write(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND worker_id = ?",
+            (status, error, time.time(), job_id, worker_id)
+        )
+
+    def requeue(self, job_id, worker_id):
+        """
+        Hands a job that still owes posts back to the queue (worker shutting down).
+        """
+        self._write("""
+            UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END,
+                worker_id = NULL
+            WHERE id = ? AND worker_id = ? AND status IN ('running', 'paused')
+        """, (job_id, worker_id))
+
+    def heartbeat(self, worker_id, job_ids, stats=None):
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO workers (worker_id, pid, heartbeat_at, stats) VALUES (?, ?, ?, ?)",
+            (worker_id, os.getpid(), now, json.dumps(stats) if stats is not None else None)
+        )
+        for job_id in job_ids:
+            self._write("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker_id = ?", (now, job_id, worker_id))
+
+    def remove_worker(self, worker_id):
+        self._write("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+
+_JOB_COLUMNS = "id, kind, params, status, pause_requested, cancel_requested, progress, message, error, created_at, started_at, finished_at"
+
+def _job(row):
+    return {
+        'id': row[0],
+        'kind': row[1],
+        'params': json.loads(row[2]),
+        'status': row[3],
+        'pause_requested': bool(row[4]),
+        'cancel_requested': bool(row[5]),
+        'progress': json.loads(row[6]) if row[6] else {},
+        'message': row[7],
+        'error': row[8],
+        'created_at': row[9],
+        'started_at': row[10],
+        'finished_at': row[11],
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_job_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore()
+    return _store
+
+def submit_mass_job(target_keywords, niche, max_posts, sitemap_url=None, write_workers=None,
+                    media_workers=None, publish_workers=None):
+    """
+    Queues a Mass Automation run (see main.run_mass_automation_gen).
+    """
+    params = {
+        'target_keywords': list(target_keywords),
+        'niche': niche,
+        'max_posts': int(max_posts),
+        'sitemap_url': sitemap_url,
+        'write_workers': write_workers,
+        'media_workers': media_workers,
+        'publish_workers': publish_workers,
+    }
+    return get_job_store().submit('mass', {k: v for k, v in params.items() if v is not None})
+
+def spawn_worker(concurrency=JOB_WORKER_CONCURRENCY):
+    """
+    Starts a detached worker process (outlives the Streamlit session).
+    """
+    return subprocess.Popen(
+        [sys.executable, '-m', 'auto_blog.jobs', 'worker', '--concurrency', str(concurrency)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+        cwd=os.getcwd(),
+    )
+
+
+class JobControl:
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self.pause_event = threading.Event()
+        # Set only when the job was cancelled: the pipeline also sets
+        # stop_event whenever a run ends, so that can't tell the two apart
+        self.cancelled = threading.Event()
+        # Set when the worker is shutting down: the job goes back to the queue
+        self.shutdown = threading.Event()
+
+
+class Worker:
+    """
+    Runs queued jobs, up to `concurrency` at a time, each in its own thread.
+    Every poll it sends heartbeats, applies pause/resume/cancel requests and
+    claims more jobs. A job whose worker dies is queued again once its
+    heartbeat goes stale (or right away if the worker shuts down cleanly),
+    and only runs the posts it still owes.
+    """
+    def __init__(self, store=None, concurrency=JOB_WORKER_CONCURRENCY, poll_interval=JOB_POLL_INTERVAL):
+        self.store = store or get_job_store()
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.running = {}  # job id -> (thread, JobControl)
+        self.stop_event = threading.Event()
+
+    def run(self, once=False):
+        print(f"Job worker {self.worker_id} started (concurrency {self.concurrency})")
+        try:
+            while not self.stop_event.is_set():
+                self.poll()
+                if once and not self.running:
+                    return
+                self.stop_event.wait(self.poll_interval)
+        finally:
+            # Let running jobs wind down: in-flight posts finish, nothing new
+            # starts, and the jobs are queued again for the next worker
+            for thread, control in self.running.values():
+                control.shutdown.set()
+                control.stop_event.set()
+            for thread, control in self.running.values():
+                thread.join()
+            self.store.remove_worker(self.worker_id)
+
+    def poll(self):
+        self.store.heartbeat(self.worker_id, list(self.running), runtime_stats())
+        for job_id, (thread, control) in list(self.running.items()):
+            if not thread.is_alive():
+                del self.running[job_id]
+                continue
+            pause, cancel = self.store.controls(job_id)
+            if cancel:
+                control.cancelled.set()
+                control.stop_event.set()
+            elif pause and not control.pause_event.is_set():
+                control.pause_event.set()
+                self.store.set_status(job_id, 'paused')
+            elif not pause and control.pause_event.is_set():
+                control.pause_event.clear()
+                self.store.set_status(job_id, 'running')
+        while len(self.running) < self.concurrency:
+            job = self.store.claim(self.worker_id)
+            if job is None:
+                break
+            control = JobControl()
+            thread = threading.Thread(target=self._run_job, args=(job, control), name=f"job-{job['id']}", daemon=True)
+            self.running[job['id']] = (thread, control)
+            thread.start()
+
+    def _run_job(self, job, control):
+        job_id = job['id']
+        runner = JOB_RUNNERS.get(job['kind'])
+        if runner is None:
+            self.store.finish(job_id, self.worker_id, 'failed', f"Unknown job kind: {job['kind']}")
+            return
+        try:
+            runner(self.store, job, control)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.store.finish(job_id, self.worker_id, 'failed', str(e))
+            return
+        if control.cancelled.is_set():
+            self.store.finish(job_id, self.worker_id, 'cancelled')
+        elif control.shutdown.is_set():
+            # A job that had in fact finished returns at once when it is claimed again
+            self.store.requeue(job_id, self.worker_id)
+        else:
+            self.store.finish(job_id, self.worker_id, 'done')
+
+
+def runtime_stats():
+    """
+    This process's LLM cache, XML-RPC batching and rate limiter counters.
+    Workers send them with every heartbeat, since the app process no longer
+    makes the calls they count.
+    """
+    from . import content, wordpress, ratelimit
+    cache = content.get_llm_cache().stats()
+    return {
+        'llm_hits': cache['hits'],
+        'llm_misses': cache['misses'],
+        'round_trips_saved': wordpress.multicall_stats()['round_trips_saved'],
+        'limiters': ratelimit.limiter_stats(),
+    }
+
+def run_mass_job(store, job, control):
+    from .main import run_mass_automation_gen  # main imports the whole pipeline; only workers need it
+
+    params = dict(job['params'])
+    progress = dict(job['progress'] or {})
+    # A re-queued job only needs the posts it hasn't published yet
+    already = progress.get('published', 0)
+    target = params.pop('max_posts')
+    progress.update({'published': already, 'max': target})
+    remaining = target - already
+    if remaining <= 0:
+        return
+
+    events = run_mass_automation_gen(
+        max_posts=remaining, stop_event=control.stop_event, pause_event=control.pause_event, **params
+    )
+    for event in events:
+        message = event.get('message')
+        if event['type'] == 'published':
+            progress['published'] = already + event['count']
+            message = f"Published {progress['published']}/{target}: {event['title']}"
+            store.record(job['id'], event, progress=progress, message=message)
+        elif event['type'] in ('status', 'warning', 'error'):
+            store.record(job['id'], event, message=message)
+        else:
+            store.record(job['id'], event)
+
+JOB_RUNNERS = {
+    'mass': run_mass_job,
+}
+
+if __name__ == "__main__":
+    # python -m auto_blog.jobs worker [--concurrency N] [--once]
+    # python -m auto_blog.jobs list
+    parser = argparse.ArgumentParser(prog="python -m auto_blog.jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker_parser = sub.add_parser("worker", help="run queued jobs until interrupted")
+    worker_parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    worker_parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    sub.add_parser("list", help="show recent jobs")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        worker = Worker(concurrency=args.concurrency)
+        try:
+            worker.run(once=args.once)
+        except KeyboardInterrupt:
+            pass
+    else:
+        for j in get_job_store().list():
+            print(f"#{j['id']} {j['kind']} {j['status']} {j['progress']} {j['message'] or ''}")
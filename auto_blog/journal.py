@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from .config import JOURNAL_DB_PATH, JOURNAL_LEASE, JOURNAL_MAX_ATTEMPTS, JOURNAL_KEEP_DAYS
+
+# Stages in the order a post goes through them; each record() is written
+# before the run moves on, so a restart picks up after the last one
+#   claimed    -> item exists, nothing paid for yet
+#   written    -> post_data (and validation_results) saved
+#   media      -> uploaded images saved
+#   publishing -> create_post was about to be called: check the site before posting again
+#   published  -> post_id saved
+FINAL_STAGES = ('published', 'skipped', 'failed')
+
+def make_owner():
+    """
+    Id for one run; items it holds are released when the run ends.
+    """
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+def _owner_alive(owner, updated_at, now):
+    if not owner or now - (updated_at or 0) > JOURNAL_LEASE:
+        return False
+    parts = owner.rsplit('-', 2)
+    # Only processes on this machine can be checked (and os.kill(pid, 0)
+    # sends Ctrl+C on Windows); otherwise wait for the lease to run out
+    if len(parts) != 3 or parts[0] != socket.gethostname() or os.name == 'nt':
+        return True
+    try:
+        os.kill(int(parts[1]), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+class StageJournal:
+    """
+    Write-ahead journal of posts in flight: one row per item (a keyword or a
+    claimed title) with the output of every stage it has finished, so a run
+    that dies after the LLM call or the image uploads resumes from there
+    instead of paying for them again.
+    Items are held by the run that opened them; once that process is gone
+    (or has been idle longer than JOURNAL_LEASE) another run can take them over.
+    """
+    def __init__(self, path=JOURNAL_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    key TEXT PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    keyword TEXT,
+                    title TEXT,
+                    stage TEXT NOT NULL,
+                    data TEXT NOT NULL DEFAULT '{}',
+                    owner TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_items_scope ON items(scope, stage)")
+
+    def _read(self, sql, args=()):
+        with self._lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def _write(self, sql, args=()):
+        with self._lock:
+            with self.conn:
+                return self.conn.execute(sql, args)
+
+    def get(self, key):
+        rows = self._read(
+            "SELECT key, scope, keyword, title, stage, data, owner, attempts FROM items WHERE key = ?", (key,)
+        )
+        return _entry(rows[0]) if rows else None
+
+    def open(self, key, scope, owner, keyword=None, title=None):
+        """
+        Takes item key for owner: a new item, or one left unfinished by a run
+        that is gone. Returns its entry ({'key', 'stage', ...saved outputs})
+        or None if it is finished, given up, or held by a live run.
+        """
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO items (key, scope, keyword, title, stage, owner, attempts, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'claimed', ?, 1, ?, ?)",
+                    (key, scope, keyword, title, owner, now, now)
+                )
+                if cursor.rowcount:
+                    return {'key': key, 'scope': scope, 'keyword': keyword, 'title': title, 'stage': 'claimed', 'attempts': 1}
+                row = self.conn.execute("SELECT stage, owner, updated_at FROM items WHERE key = ?", (key,)).fetchone()
+        stage, current, updated_at = row
+        if stage in FINAL_STAGES or current == owner or _owner_alive(current, updated_at, now):
+            return None
+        return self._take_over(key, current, owner)
+
+    def _take_over(self, key, previous, owner):
+        # Compare-and-swap on the previous owner, so two runs can't both take it
+        with self._lock:
+            with self.conn:
+                row = self.conn.execute("SELECT attempts FROM items WHERE key = ? AND owner IS ?", (key, previous)).fetchone()
+                if row is None:
+                    return None
+                if row[0] >= JOURNAL_MAX_ATTEMPTS:
+                    self.conn.execute(
+                        "UPDATE items SET stage = 'failed', owner = NULL, updated_at = ? WHERE key = ?", (time.time(), key)
+                    )
+                    return None
+                cursor = self.conn.execute(
+                    "UPDATE items SET owner = ?, attempts = attempts + 1, updated_at = ? WHERE key = ? AND owner IS ?",
+                    (owner, time.time(), key, previous)
+                )
+                if not cursor.rowcount:
+                    return None
+        return self.get(key)
+
+    def resumable(self, scope, owner):
+        """
+        Unfinished items in scope that no live run holds, oldest first, as
+        {'key', 'keyword', 'title', 'stage'}. Nothing is taken: open() each
+        one when work on it actually starts, so items a short run never
+        gets to don't use up attempts.
+        """
+        now = time.time()
+        rows = self._read(
+            "SELECT key, keyword, title, stage, owner, updated_at FROM items "
+            "WHERE scope = ? AND stage NOT IN (?, ?, ?) ORDER BY created_at",
+            (scope,) + FINAL_STAGES
+        )
+        return [
+            {'key': key, 'keyword': keyword, 'title': title, 'stage': stage}
+            for key, keyword, title, stage, current, updated_at in rows
+            if current != owner and not _owner_alive(current, updated_at, now)
+        ]
+
+    def record(self, key, stage, **outputs):
+        """
+        Marks key as having reached stage, merging outputs (JSON-serializable)
+        into what is already saved. Committed before it returns.
+        """
+        with self._lock:
+            with self.conn:
+                row = self.conn.execute("SELECT data FROM items WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return
+                data = json.loads(row[0])
+                data.update(outputs)
+                self.conn.execute(
+                    "UPDATE items SET stage = ?, data = ?, updated_at = ? WHERE key = ?",
+                    (stage, json.dumps(data), time.time(), key)
+                )
+
+    def release(self, owner):
+        """
+        Lets go of owner's unfinished items so the next run resumes them at once.
+        """
+        self._write(
+            "UPDATE items SET owner = NULL WHERE owner = ? AND stage NOT IN (?, ?, ?)", (owner,) + FINAL_STAGES
+        )
+
+    def prune(self, max_age=JOURNAL_KEEP_DAYS * 86400):
+        cursor = self._write(
+            "DELETE FROM items WHERE stage IN (?, ?, ?) AND updated_at < ?", FINAL_STAGES + (time.time() - max_age,)
+        )
+        return cursor.rowcount
+
+    def pending(self):
+        """
+        [(scope, stage, count)] of unfinished items.
+        """
+        return self._read(
+            "SELECT scope, stage, COUNT(*) FROM items WHERE stage NOT IN (?, ?, ?) GROUP BY scope, stage ORDER BY scope",
+            FINAL_STAGES
+        )
+
+
+def _entry(row):
+    entry = json.loads(row[5]) if row[5] else {}
+    entry.update({'key': row[0], 'scope': row[1], 'keyword': row[2], 'title': row[3], 'stage': row[4], 'owner': row[6], 'attempts': row[7]})
+    return entry
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def get_journal():
+    """
+    The shared journal; finished items older than JOURNAL_KEEP_DAYS are pruned on first use.
+    """
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                journal = StageJournal()
+                journal.prune()
+                _journal = journal
+    return _journal
+
+if __name__ == "__main__":
+    # python -m auto_blog.journal [prune]   (unfinished items per scope and stage)
+    if len(sys.argv) > 1 and sys.argv[1] == 'prune':
+        print(f"Pruned {get_journal().prune(0)} finished items")
+    for scope, stage, count in get_journal().pending():
+        print(f"{scope}\t{stage}\t{count}")
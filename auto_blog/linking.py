@@ -0,0 +1,106 @@
+import re
+import math
+import threading
+
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'for', 'to', 'of', 'in', 'on', 'at', 'by', 'with',
+    'from', 'your', 'you', 'our', 'we', 'it', 'its', 'is', 'are', 'be', 'can', 'will', 'do',
+    'how', 'why', 'what', 'when', 'which', 'who', 'that', 'this', 'these', 'those', 'vs',
+}
+
+def stem(word):
+    """
+    Light plural strip: "tips" -> "tip", "tomatoes" -> "tomato",
+    "berries" -> "berry", "boxes" -> "box"; "glass", "status" stay as they are.
+    """
+    if len(word) <= 3 or not word.endswith('s') or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('oes') and len(word) > 5:
+        return word[:-2]
+    if word.endswith(('ches', 'shes', 'sses', 'xes', 'zes')):
+        return word[:-2]
+    return word[:-1]
+
+def tokenize(text):
+    """
+    Lowercased content words, plurals stripped (see stem).
+    """
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (text or '').lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        tokens.append(stem(word))
+    return tokens
+
+class LinkIndex:
+    """
+    Inverted index over existing post titles (and optional excerpts) with
+    BM25 scoring, for picking relevant internal links.
+    Scoring only touches the postings of the query's terms, so a query stays
+    cheap no matter how many posts are indexed. Posts can be added while the
+    index is in use (thread-safe).
+    """
+    def __init__(self, posts=None, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = []        # [{'title': ..., 'link': ...}]
+        self.doc_lens = []
+        self.postings = {}    # term -> {doc_id: term frequency}
+        self.total_len = 0
+        self._by_title = {}
+        self._lock = threading.Lock()
+        for p in posts or []:
+            self.add(p['title'], p['link'], p.get('excerpt', ''))
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, title, link, excerpt=''):
+        """
+        Indexes a post. Re-adding a known title just updates its link.
+        """
+        with self._lock:
+            doc_id = self._by_title.get(title)
+            if doc_id is not None:
+                self.docs[doc_id]['link'] = link
+                return
+            tokens = tokenize(title) + tokenize(excerpt)
+            doc_id = len(self.docs)
+            self.docs.append({'title': title, 'link': link})
+            self.doc_lens.append(len(tokens))
+            self.total_len += len(tokens)
+            self._by_title[title] = doc_id
+            for term in tokens:
+                freqs = self.postings.setdefault(term, {})
+                freqs[doc_id] = freqs.get(doc_id, 0) + 1
+
+    def query(self, text, k=5, min_score=0.0):
+        """
+        Top-k posts for text as [{'title': ..., 'link': ...}], best first.
+        Posts sharing no terms with text are never returned, and the post
+        with exactly this title is skipped.
+        """
+        terms = set(tokenize(text))
+        with self._lock:
+            n = len(self.docs)
+            if not n or not terms:
+                return []
+            avgdl = self.total_len / n or 1.0
+            scores = {}
+            for term in terms:
+                freqs = self.postings.get(term)
+                if not freqs:
+                    continue
+                idf = math.log(1 + (n - len(freqs) + 0.5) / (len(freqs) + 0.5))
+                for doc_id, tf in freqs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lens[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            skip = self._by_title.get(text)
+            ranked = sorted(
+                (doc_id for doc_id, score in scores.items() if score > min_score and doc_id != skip),
+                key=lambda d: scores[d], reverse=True
+            )
+            return [dict(self.docs[doc_id]) for doc_id in ranked[:k]]
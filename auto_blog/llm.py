@@ -0,0 +1,145 @@
+import asyncio
+import json
+import threading
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from .config import (
+    OPENROUTER_API_KEY, GEMINI_MODEL, SITE_URL, SITE_NAME,
+    LLM_POOL_CONNECTIONS, LLM_POOL_MAXSIZE, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+    LLM_MAX_CONCURRENCY,
+)
+from .ratelimit import APIError, get_limiter
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+class LLMClient:
+    """
+    Shared OpenRouter client.
+    Keeps a pooled keep-alive session so repeated completions reuse the
+    same TCP/TLS connection instead of handshaking on every call.
+    """
+    def __init__(self, api_key=OPENROUTER_API_KEY, model=GEMINI_MODEL,
+                 pool_connections=LLM_POOL_CONNECTIONS, pool_maxsize=LLM_POOL_MAXSIZE,
+                 connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT,
+                 max_concurrency=LLM_MAX_CONCURRENCY):
+        self.api_key = api_key
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_concurrency = max_concurrency
+
+        self.session = requests.Session()
+        # pool_maxsize caps open connections per host; block=True makes extra
+        # threads wait for a free connection rather than opening throwaway ones.
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": SITE_URL,
+            "X-Title": SITE_NAME,
+        })
+
+    def build_payload(self, prompt, reasoning_enabled=False):
+        data = {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if reasoning_enabled:
+            data["reasoning"] = {"enabled": True}
+        return data
+
+    def complete(self, prompt, reasoning_enabled=False):
+        """
+        Sends a prompt and returns the text response.
+        """
+        data = self.build_payload(prompt, reasoning_enabled)
+        response = self.session.post(OPENROUTER_URL, data=json.dumps(data), timeout=self.timeout)
+        get_limiter('openrouter').update_from_headers(response.headers)
+
+        if response.status_code != 200:
+            raise APIError.from_response("OpenRouter Error", response)
+
+        json_response = response.json()
+        if 'choices' in json_response and len(json_response['choices']) > 0:
+            return json_response['choices'][0]['message']['content']
+        else:
+            return ""
+
+    def stream(self, prompt, reasoning_enabled=False):
+        """
+        Streams the completion (OpenRouter SSE mode).
+        Yields text deltas as they arrive; reasoning tokens are not yielded.
+        """
+        data = self.build_payload(prompt, reasoning_enabled)
+        data["stream"] = True
+        with self.session.post(OPENROUTER_URL, data=json.dumps(data), timeout=self.timeout, stream=True) as response:
+            get_limiter('openrouter').update_from_headers(response.headers)
+            if response.status_code != 200:
+                raise APIError.from_response("OpenRouter Error", response)
+
+            for raw_line in response.iter_lines(decode_unicode=False):
+                # Blank lines separate events; lines starting with ':' are keep-alive comments
+                if not raw_line or raw_line.startswith(b':'):
+                    continue
+                line = raw_line.decode('utf-8')
+                if not line.startswith('data:'):
+                    continue
+                payload = line[5:].strip()
+                if payload == '[DONE]':
+                    break
+                try:
+                    event = json.loads(payload)
+                except ValueError:
+                    continue
+                if 'error' in event:
+                    error = event['error']
+                    code = error.get('code') if isinstance(error, dict) else None
+                    raise APIError(f"OpenRouter Stream Error: {error}", status_code=code if isinstance(code, int) else None)
+                choices = event.get('choices') or []
+                if choices:
+                    delta = choices[0].get('delta') or {}
+                    if delta.get('content'):
+                        yield delta['content']
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_llm_client():
+    """
+    Returns the process-wide LLMClient, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+
+_semaphores = weakref.WeakKeyDictionary()
+
+def _get_semaphore(limit):
+    # asyncio primitives are bound to the loop they are used on, so keep one per loop.
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(limit)
+        _semaphores[loop] = sem
+    return sem
+
+async def run_bounded(func, *args, limit=None):
+    """
+    Runs a blocking call in the default executor, bounded by a per-loop semaphore.
+    """
+    sem = _get_semaphore(limit or get_llm_client().max_concurrency)
+    async with sem:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: func(*args))
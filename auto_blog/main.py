@@ -1,18 +1,20 @@
+import sys
+import json
 import time
-import os
-from . import config, trends, content, images, wordpress
+import queue
+import signal
+import argparse
+import datetime
+import itertools
+import threading
+import concurrent.futures
+import requests
+from . import config, trends, content, images, wordpress, media, posts, publisher, history, journal
+from .linking import LinkIndex
+from .dedup import NearDuplicateIndex
+from .pipeline import Pipeline, Stage
 
-HISTORY_FILE = "posted_keywords.txt"
-
-def load_history():
-    if not os.path.exists(HISTORY_FILE):
-        return set()
-    with open(HISTORY_FILE, "r") as f:
-        return set(line.strip() for line in f)
-
-def save_history(keyword):
-    with open(HISTORY_FILE, "a") as f:
-        f.write(f"{keyword}\n")
+PING_EVERY = 10  # Ping the sitemap after this many published posts
 
 def run_automation_gen(sub_niche):
     """
@@ -29,78 +31,541 @@ def run_automation_gen(sub_niche):
         yield "❌ No keywords found. Exiting."
         return
 
-    posted_keywords = load_history()
+    store = history.get_history_store()
+    log = journal.get_journal()
+    scope = f"single:{sub_niche}"
+    owner = journal.make_owner()
     
     try:
         client = wordpress.get_wp_client()
-        yield "✅ Connected to WordPress"
+        wp = publisher.get_publisher(client)
+        yield f"✅ Connected to WordPress ({wp.name})"
     except Exception as e:
         yield f"❌ WordPress Connection Failed: {e}"
         return
 
-    for i, keyword in enumerate(keywords):
-        if keyword in posted_keywords:
-            yield f"⚠️ Skipping '{keyword}', already posted."
-            continue
-            
-        yield f"⚙️ Processing keyword ({i+1}/{len(keywords)}): {keyword}"
-        
-        # 2. Generate Content
-        yield "   📝 Generating blog post content..."
-        post_data = content.generate_blog_post(keyword, sub_niche)
+    # Keywords an interrupted run left half done go first, from their last finished stage
+    # (each is only taken over by open() below, when its turn comes)
+    resumed = [e['keyword'] for e in log.resumable(scope, owner)]
+    if resumed:
+        yield f"♻️ Resuming {len(resumed)} interrupted keyword(s): {resumed}"
+        keywords = resumed + [k for k in keywords if k not in resumed]
+
+    try:
+        for i, keyword in enumerate(keywords):
+            if store.has_keyword(keyword):
+                yield f"⚠️ Skipping '{keyword}', already posted."
+                continue
+
+            entry = log.open(f"{scope}:{keyword.lower()}", scope, owner, keyword=keyword)
+            if entry is None:
+                yield f"⚠️ Skipping '{keyword}', another run is working on it (or it was given up)."
+                continue
+            key = entry['key']
+
+            yield f"⚙️ Processing keyword ({i+1}/{len(keywords)}): {keyword}"
+
+            # 2. Generate Content
+            post_data = entry.get('post_data')
+            if post_data:
+                yield f"   ♻️ Reusing generated post from the journal: {post_data['title']}"
+            else:
+                yield "   📝 Generating blog post content..."
+                post_data = content.generate_blog_post(keyword, sub_niche)
+                if not post_data:
+                    yield "   ❌ Failed to generate content."
+                    continue
+                log.record(key, 'written', post_data=post_data)
+                yield f"   ✅ Generated title: {post_data['title']}"
+
+            # 3. Get Image
+            if 'image_id' in entry:
+                image_id = entry['image_id']
+                if image_id:
+                    yield "   ♻️ Reusing uploaded image from the journal."
+            else:
+                yield "   🖼️ Searching for image..."
+                photos = images.take_photos(keyword, count=1)
+                image_id = None
+
+                if photos:
+                    yield "   ⬆️ Uploading image to WordPress (reusing it if already in the media library)..."
+                    try:
+                        uploaded = media.upload_photos(wp, photos, keyword)
+                        if uploaded:
+                            image_id = uploaded[0]['id']
+                            yield "   ✅ Image reused from media library." if uploaded[0]['reused'] else "   ✅ Image uploaded successfully."
+                    except Exception as e:
+                        yield f"   ⚠️ Failed to upload image: {e}"
+                else:
+                     yield "   ⚠️ No image found."
+                log.record(key, 'media', image_id=image_id)
+
+            # 4. Post to WordPress
+            try:
+                post_id = None
+                if entry['stage'] == 'publishing':
+                    # The last run died around create_post: it may be live already
+                    posts.sync(client)
+                    post_id = posts.get_post_index().find_by_title(post_data['title'])
+                    if post_id:
+                        yield f"   ♻️ Post was already published by the interrupted run (ID: {post_id})."
+                if post_id is None:
+                    yield "   🚀 Publishing post..."
+                    log.record(key, 'publishing')
+                    post_id = wp.create_post(
+                        post_data['title'], 
+                        post_data['content'], 
+                        post_data['tags'], 
+                        image_id,
+                        categories=[sub_niche]
+                    )
+                    yield f"   🎉 Successfully published post ID: {post_id}"
+                log.record(key, 'published', post_id=post_id)
+                store.add_keyword(keyword)
+                store.add_title(post_data['title'], keyword)
+            except Exception as e:
+                yield f"   ❌ Failed to publish post: {e}"
+
+            # Sleep to be nice to APIs
+            yield "   💤 Waiting 5 seconds..."
+            time.sleep(5)
+    finally:
+        # Unfinished keywords are picked up by the next run
+        log.release(owner)
+
+    yield "🏁 Automation cycle complete."
+
+def run_mass_automation_gen(target_keywords, niche, max_posts, sitemap_url=None,
+                            write_workers=config.MASS_WRITE_WORKERS,
+                            media_workers=config.MASS_MEDIA_WORKERS,
+                            publish_workers=config.MASS_PUBLISH_WORKERS, client=None,
+                            stop_event=None, pause_event=None):
+    """
+    Mass Automation mode as a staged pipeline:
+      titles (source) -> write (LLM body) -> media (images) -> publish
+    Each stage has its own workers and a bounded queue, so post N+1 is being
+    written while post N's images upload and post N-1 publishes.
+    Yields event dicts: {'type': 'status'|'warning'|'error'|'validation'|
+    'published'|'toast'|'indexed'|'done', ...}
+    client: XML-RPC client for the setup calls (a new one if not given).
+    stop_event / pause_event (threading.Event) let another thread stop or
+    pause the run; in-flight posts are always finished.
+    Every stage's output is journaled per title, so posts an interrupted run
+    of the same niche left half done are resumed first without redoing the
+    LLM call or the uploads.
+    """
+    store = history.get_history_store()
+    client = client or wordpress.get_wp_client()
+    log = journal.get_journal()
+    scope = f"mass:{niche}"
+    owner = journal.make_owner()
+
+    # Internal links index: only posts changed since the last run are fetched; the rest come from the local mirror
+    yield {'type': 'status', 'message': "Syncing post index for internal linking..."}
+    posts.sync(client)
+    all_posts_index = posts.get_post_index().all()
+    # Titles already on the site count as posted too (even if published elsewhere)
+    site_titles = set(p['title'] for p in all_posts_index)
+
+    def is_posted(title):
+        return title in site_titles or store.has_title(title)
+
+    # Near-duplicate index over everything already posted; queued titles are added as they're claimed
+    dup_index = NearDuplicateIndex(site_titles | store.titles())
+    link_index = LinkIndex(all_posts_index)
+    yield {'type': 'indexed', 'count': len(all_posts_index)}
+
+    # First run only: learn which Pexels photos are already in the media library
+    seeded = media.ensure_seeded(client)
+    if seeded:
+        yield {'type': 'status', 'message': f"Found {seeded} existing Pexels images in the media library."}
+
+    counter_lock = threading.Lock()
+    links_lock = threading.Lock()
+    unresolved = []  # (post_id, title) still linked by shortlink
+    published = [0]
+    # xmlrpc clients are not thread-safe: one publisher per worker thread
+    # (the REST publisher is a single shared, pooled instance)
+    local = threading.local()
+    search_executor = concurrent.futures.ThreadPoolExecutor(max_workers=write_workers)
+
+    def wp():
+        if getattr(local, 'publisher', None) is None:
+            local.publisher = publisher.get_publisher()
+        return local.publisher
+
+    pipeline = None
+
+    def resolve_links():
+        with links_lock:
+            batch = unresolved[:]
+            del unresolved[:]
+        if not batch:
+            return
+        links = wp().get_post_links([post_id for post_id, _ in batch])
+        for post_id, title in batch:
+            link_index.add(title, links[post_id])
+
+    def title_source():
+        claimed = set()
+        # Posts an interrupted run left half done go first, from their last finished stage.
+        # Each is taken over only when the pipeline pulls it, so the ones past
+        # max_posts stay untouched for the next run
+        resumed = log.resumable(scope, owner)
+        if resumed:
+            pipeline.events.put({'type': 'status', 'message': f"Resuming {len(resumed)} interrupted post(s) from the journal..."})
+        for candidate in resumed:
+            entry = log.open(candidate['key'], scope, owner)
+            if entry is None:
+                continue
+            claimed.add(entry['title'])
+            dup_index.add(entry['title'])
+            yield entry
+
+        empty_rounds = 0
+        while True:
+            # One batched LLM call per round covers every target keyword
+            pipeline.events.put({'type': 'status', 'message': f"Generating fresh titles for {len(target_keywords)} keyword(s)..."})
+            fresh_titles = content.generate_titles_batch(target_keywords, count=10, fresh=True)
+
+            # Filter duplicates (already published, or already queued in this run)
+            unique_by_kw = {}
+            for kw in target_keywords:
+                unique = [t for t in fresh_titles.get(kw, []) if t not in claimed and not is_posted(t)]
+                if unique:
+                    unique_by_kw[kw] = unique
+                else:
+                    pipeline.events.put({'type': 'warning', 'message': f"No new unique titles found for {kw}. Skipping..."})
+
+            # Interleave keywords so posts rotate across them
+            yielded = 0
+            for batch in itertools.zip_longest(*unique_by_kw.values()):
+                for kw, t in zip(unique_by_kw.keys(), batch):
+                    if t is None or t in claimed:
+                        continue
+                    # Near-duplicates of posted/queued titles would cannibalize them: skip before any LLM spend
+                    near = dup_index.find(t)
+                    if near:
+                        pipeline.events.put({'type': 'warning', 'message': f"Skipping '{t}': too similar to '{near[0]}' ({near[1]:.0%})."})
+                        continue
+                    # None if another run already has this title
+                    entry = log.open(f"{scope}:{history.normalize_title(t)}", scope, owner, keyword=kw, title=t)
+                    if entry is None:
+                        continue
+                    claimed.add(t)
+                    dup_index.add(t)
+                    yielded += 1
+                    yield entry
+
+            if yielded:
+                empty_rounds = 0
+                continue
+            empty_rounds += 1
+            if empty_rounds >= 3:
+                pipeline.events.put({'type': 'warning', 'message': "Keywords look exhausted, stopping."})
+                return
+            if pipeline.stop_event.wait(2):
+                return
+
+    def release_photos(item):
+        # The post won't reach media_stage: hand back the photos its search
+        # reserves (now or once it finishes) instead of holding them for an hour
+        future = item.pop('image_future', None)
+        if future is None:
+            return
+        def release(done):
+            if not done.cancelled() and done.exception() is None:
+                images.get_reservoir().release([p['id'] for p in done.result() or []])
+        future.add_done_callback(release)
+
+    def write_stage(item, emit):
+        title = item['title']
+        if item.get('post_data'):
+            emit({'type': 'status', 'message': f"Reusing the journaled draft of: {title}"})
+            return item
+        if is_posted(title):
+            log.record(item['key'], 'skipped')
+            return None
+        emit({'type': 'status', 'message': f"Writing post: {title}"})
+
+        # Contextual Linking: the 5 existing posts most relevant to this title
+        relevant_links = link_index.query(title, k=5)
+
+        # Start the image search as soon as the title section streams in
+        def on_section(name, value):
+            if name == "title" and 'image_future' not in item:
+                item['image_future'] = search_executor.submit(images.take_photos, item['keyword'], 3)
+
+        try:
+            post_data = content.generate_blog_post(title, niche, internal_links=relevant_links, on_section=on_section)
+        except Exception:
+            release_photos(item)
+            raise
         if not post_data:
-            yield "   ❌ Failed to generate content."
-            continue
-            
-        yield f"   ✅ Generated title: {post_data['title']}"
-        
-        # 3. Get Image
-        yield "   🖼️ Searching for image..."
-        image_url = images.get_image_url(keyword)
-        image_path = None
-        image_id = None
-        
-        if image_url:
-            yield f"   ⬇️ Downloading image..."
-            image_path = images.download_image(image_url, f"temp_{keyword.replace(' ', '_')}.jpg")
-            if image_path:
-                yield "   ⬆️ Uploading image to WordPress..."
-                try:
-                    image_id = wordpress.upload_image_to_wp(client, image_path, keyword)
-                    yield "   ✅ Image uploaded successfully."
-                except Exception as e:
-                    yield f"   ⚠️ Failed to upload image: {e}"
-        else:
-             yield "   ⚠️ No image found."
-        
-        # 4. Post to WordPress
-        yield "   🚀 Publishing post..."
+            release_photos(item)
+            emit({'type': 'error', 'message': f"Failed to generate content for '{title}'."})
+            return None
+
+        checks = content.validate_post_structure(post_data)
+        item['post_data'] = post_data
+        item['validation_results'] = {c[0]: c[1] for c in checks}
+        log.record(item['key'], 'written', post_data=post_data, validation_results=item['validation_results'])
+        emit({
+            'type': 'validation',
+            'title': title,
+            'checks': checks,
+            'ttft': post_data.get('ttft'),
+            'generation_time': post_data.get('generation_time'),
+        })
+        return item
+
+    def media_stage(item, emit):
+        title = item['title']
+        if 'uploaded_imgs' in item:
+            return item
+        future = item.pop('image_future', None)
+        photos = future.result() if future else images.take_photos(item['keyword'], count=3)
+        # Known photos are reused from the media library; the rest are downloaded concurrently and uploaded
+        uploaded_imgs = media.upload_photos(wp(), photos, title)
+        reused = sum(1 for img in uploaded_imgs if img['reused'])
+        if reused:
+            emit({'type': 'status', 'message': f"Reused {reused} existing image(s) for '{title}'."})
+        item['uploaded_imgs'] = uploaded_imgs
+        log.record(item['key'], 'media', uploaded_imgs=uploaded_imgs)
+        return item
+
+    def publish_stage(item, emit):
+        title = item['title']
+        post_data = item['post_data']
+        validation_results = item['validation_results']
+        uploaded_imgs = item['uploaded_imgs']
+
+        # SEO Meta Data
+        custom_fields = content.build_seo_fields(post_data)
+        if post_data.get('meta_title'):
+            validation_results["SEO Meta"] = True
+
+        featured_id = uploaded_imgs[0]['id'] if uploaded_imgs else None
+        final_content = content.inject_images(post_data['content'], uploaded_imgs, title)
+
+        post_id = None
+        if item['stage'] == 'publishing':
+            # The last run died around create_post: the setup sync would have mirrored the post if it went live
+            post_id = posts.get_post_index().find_by_title(post_data['title'])
+            if post_id:
+                emit({'type': 'status', 'message': f"'{title}' was already published by the interrupted run (ID {post_id})."})
+        recovered = post_id is not None
+        if not recovered:
+            log.record(item['key'], 'publishing')
+            post_id = wp().create_post(post_data['title'], final_content, post_data['tags'], featured_id, [niche], custom_fields=custom_fields)
+        log.record(item['key'], 'published', post_id=post_id)
+
+        # Update History
+        store.add_title(title, item['keyword'])
+        store.log_event({
+            "title": title,
+            "keyword": item['keyword'],
+            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "Published",
+            "validations": validation_results,
+            "images": len(uploaded_imgs),
+            "seo_meta": bool(custom_fields)
+        })
+
+        # Update Link Index: the ?p=<id> shortlink works right away; permalinks
+        # are looked up for several posts at once in one batched request
+        # (a recovered post is in the index already, from the mirror)
+        if not recovered:
+            link_index.add(title, wordpress.shortlink(post_id))
+            with links_lock:
+                unresolved.append((post_id, title))
+                flush = len(unresolved) >= config.WP_LINK_FLUSH_EVERY
+            if flush:
+                resolve_links()
+
+        with counter_lock:
+            published[0] += 1
+            count = published[0]
+        item['count'] = count
+        if sitemap_url and count % PING_EVERY == 0:
+            ping_sitemap(sitemap_url, emit)
+        return item
+
+    pipeline = Pipeline([
+        Stage('write', write_stage, workers=write_workers),
+        Stage('media', media_stage, workers=media_workers),
+        Stage('publish', publish_stage, workers=publish_workers),
+    ], queue_size=config.MASS_QUEUE_SIZE, stop_event=stop_event, pause_event=pause_event)
+
+    try:
+        for event in pipeline.run(title_source(), max_results=max_posts):
+            if event['type'] == 'result':
+                item = event['item']
+                yield {'type': 'published', 'title': item['title'], 'count': item['count'], 'max': max_posts}
+            elif event['type'] == 'error' and 'stage' in event:
+                # A stage raised (errors the stages emit themselves pass through as they are)
+                item = event.get('item') or {}
+                yield {'type': 'error', 'message': f"Error in {event['stage']} stage for '{item.get('title', '')}': {event['message']}"}
+            elif event['type'] == 'dropped':
+                continue
+            else:
+                yield event
+    finally:
+        search_executor.shutdown(wait=False)
+        # Unfinished posts are picked up by the next run of this niche
+        log.release(owner)
+
+    if sitemap_url and published[0] % PING_EVERY:
+        toasts = []
+        ping_sitemap(sitemap_url, toasts.append)
+        yield from toasts
+    yield {'type': 'done', 'count': published[0]}
+
+def ping_sitemap(sitemap_url, emit):
+    try:
+        requests.get(f"http://www.google.com/ping?sitemap={sitemap_url}", timeout=10)
+        emit({'type': 'toast', 'message': "✅ Sitemap Pinged to Google!"})
+    except Exception:
+        pass
+
+def read_list(path):
+    """
+    Non-empty lines of a text file, skipping '#' comments.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def parse_niches(niches=(), niches_file=None, keywords=(), keywords_file=None):
+    """
+    [(niche, [keywords])] from --niche values and a niches file, where a
+    line is either "niche" or "niche: keyword, keyword". Niches without
+    keywords of their own get the shared ones (--keyword / keywords file);
+    an empty list means "research trending keywords at run time".
+    """
+    shared = list(keywords) + (read_list(keywords_file) if keywords_file else [])
+    lines = list(niches) + (read_list(niches_file) if niches_file else [])
+    plans = []
+    for line in lines:
+        niche, _, own = line.partition(':')
+        own = [k.strip() for k in own.split(',') if k.strip()]
+        plans.append((niche.strip(), own or list(shared)))
+    return plans
+
+def run_batch_gen(plans, max_posts, parallel=1, dry_run=False, stop_event=None, **options):
+    """
+    Runs the Mass Automation pipeline for many niches in one process,
+    `parallel` niches at a time. plans: [(niche, [keywords])], see parse_niches.
+    Yields the pipeline's event dicts tagged with 'niche', plus
+    {'type': 'start'|'plan'|'failed'|'summary', ...}.
+    dry_run resolves keywords and reports the plan without writing or publishing.
+    options go to run_mass_automation_gen (worker counts, sitemap_url).
+    """
+    events = queue.Queue()
+    stop_event = stop_event or threading.Event()
+    totals = {'published': 0, 'failed': []}
+    # A pipeline sets its stop event when it reaches max_posts, so each niche
+    # gets its own; stop_event is passed on to them from the loop below
+    niche_stops = []
+
+    def run_niche(niche, keywords):
+        if stop_event.is_set():
+            return
         try:
-            post_id = wordpress.create_wp_post(
-                client, 
-                post_data['title'], 
-                post_data['content'], 
-                post_data['tags'], 
-                image_id,
-                categories=[sub_niche]
-            )
-            yield f"   🎉 Successfully published post ID: {post_id}"
-            save_history(keyword)
+            if not keywords:
+                events.put({'type': 'status', 'niche': niche, 'message': "Researching trending keywords..."})
+                keywords = trends.get_trending_keywords(niche)
+            if not keywords:
+                raise RuntimeError("no keywords found")
+            if dry_run:
+                events.put({'type': 'plan', 'niche': niche, 'keywords': keywords, 'max_posts': max_posts, **options})
+                return
+            events.put({'type': 'start', 'niche': niche, 'keywords': keywords, 'max_posts': max_posts})
+            niche_stop = threading.Event()
+            niche_stops.append(niche_stop)
+            if stop_event.is_set():
+                niche_stop.set()
+            for event in run_mass_automation_gen(keywords, niche, max_posts, stop_event=niche_stop, **options):
+                event['niche'] = niche
+                events.put(event)
         except Exception as e:
-            yield f"   ❌ Failed to publish post: {e}"
-            
-        # Cleanup
-        if image_path and os.path.exists(image_path):
-            os.remove(image_path)
-            
-        # Sleep to be nice to APIs
-        yield "   💤 Waiting 5 seconds..."
-        time.sleep(5)
+            events.put({'type': 'failed', 'niche': niche, 'message': str(e)})
 
-    yield "🏁 Automation cycle complete."
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        futures = [executor.submit(run_niche, niche, keywords) for niche, keywords in plans]
+        # Only this thread writes the events out, so lines never interleave
+        while True:
+            if stop_event.is_set():
+                for niche_stop in niche_stops:
+                    niche_stop.set()
+            try:
+                event = events.get(timeout=0.5)
+            except queue.Empty:
+                if all(f.done() for f in futures) and events.empty():
+                    break
+                continue
+            if event['type'] == 'done':
+                totals['published'] += event['count']
+            elif event['type'] == 'failed':
+                totals['failed'].append(event['niche'])
+            yield event
+
+    yield {'type': 'summary', 'niches': len(plans), 'published': totals['published'],
+           'failed': totals['failed'], 'stopped': stop_event.is_set()}
+
+def cli(argv=None):
+    """
+    python -m auto_blog.main run --niche "Urban Gardening" --max-posts 20
+    python -m auto_blog.main run --niches-file niches.txt --parallel 2 --dry-run
+    Prints one JSON object per line to stdout (everything else goes to
+    stderr); exits 1 if any niche failed.
+    """
+    parser = argparse.ArgumentParser(prog="python -m auto_blog.main")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="write and publish posts for one or more niches")
+    run.add_argument("--niche", action="append", default=[], help="niche, or 'niche: kw1, kw2' (repeatable)")
+    run.add_argument("--niches-file", help="one niche per line, optionally 'niche: kw1, kw2'")
+    run.add_argument("--keyword", action="append", default=[], help="target keyword for niches without their own (repeatable)")
+    run.add_argument("--keywords-file", help="target keywords, one per line (default: trending keywords per niche)")
+    run.add_argument("--max-posts", type=int, default=10, help="posts to publish per niche")
+    run.add_argument("--parallel", type=int, default=1, help="niches to run at once")
+    run.add_argument("--write-workers", type=int, default=config.MASS_WRITE_WORKERS)
+    run.add_argument("--media-workers", type=int, default=config.MASS_MEDIA_WORKERS)
+    run.add_argument("--publish-workers", type=int, default=config.MASS_PUBLISH_WORKERS)
+    run.add_argument("--sitemap-url", help="sitemap to ping every few posts")
+    run.add_argument("--dry-run", action="store_true", help="resolve keywords and print the plan; write and publish nothing")
+    args = parser.parse_args(argv)
+
+    plans = parse_niches(args.niche, args.niches_file, args.keyword, args.keywords_file)
+    if not plans:
+        parser.error("no niches given (--niche or --niches-file)")
+
+    # SIGTERM (systemd stop) / Ctrl+C: stop claiming new posts, finish the ones in flight
+    stop_event = threading.Event()
+    def stop(signum, frame):
+        stop_event.set()
+    previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+
+    # The modules report progress with print(); send that to stderr so
+    # stdout carries nothing but the JSON lines
+    out = sys.stdout
+    sys.stdout = sys.stderr
+    failed = False
+    try:
+        for event in run_batch_gen(
+            plans, args.max_posts, parallel=args.parallel, dry_run=args.dry_run, stop_event=stop_event,
+            write_workers=args.write_workers, media_workers=args.media_workers,
+            publish_workers=args.publish_workers, sitemap_url=args.sitemap_url,
+        ):
+            event['ts'] = datetime.datetime.now().isoformat(timespec='seconds')
+            out.write(json.dumps(event, default=str) + "\n")
+            out.flush()
+            failed = failed or event['type'] == 'failed'
+    finally:
+        sys.stdout = out
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    # CLI fallback
-    niche = input("Enter sub-niche: ")
-    for update in run_automation_gen(niche):
-        print(update)
+    sys.exit(cli())
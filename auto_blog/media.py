@@ -0,0 +1,222 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import concurrent.futures
+from .config import MEDIA_INDEX_PATH
+from . import images, wordpress
+
+# Pexels originals are named pexels-photo-<id>.jpeg (or pexels-<author>-<id>.jpg);
+# WordPress may append -<n> (duplicate name), -<w>x<h> (resized) or -scaled
+PEXELS_FILENAME_RE = re.compile(r'pexels-(?:\D*-)?(\d+)(?:-\d+)?(?:-\d+x\d+|-scaled)?\.\w+$', re.IGNORECASE)
+
+class MediaIndex:
+    """
+    Persistent map from Pexels photo id / content hash to the WordPress
+    attachment that already holds that photo, so repeats can be reused
+    instead of downloaded and uploaded again.
+    """
+    def __init__(self, path=MEDIA_INDEX_PATH):
+        self.path = path
+        self.reused = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS media (
+                wp_id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                sha256 TEXT,
+                size INTEGER,
+                created_at REAL NOT NULL
+            )
+        """)
+        # Several Pexels ids can point at the same attachment (identical content)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS photos (
+                photo_id TEXT PRIMARY KEY,
+                wp_id INTEGER NOT NULL REFERENCES media(wp_id) ON DELETE CASCADE
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_media_sha ON media(sha256)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def find_by_photo(self, photo_id):
+        return self._find(
+            "SELECT m.wp_id, m.url, m.size FROM photos p JOIN media m ON m.wp_id = p.wp_id WHERE p.photo_id = ?",
+            str(photo_id)
+        )
+
+    def find_by_hash(self, sha256):
+        return self._find("SELECT wp_id, url, size FROM media WHERE sha256 = ? ORDER BY created_at LIMIT 1", sha256)
+
+    def _find(self, sql, value):
+        with self._lock:
+            row = self.conn.execute(sql, (value,)).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'url': row[1], 'size': row[2] or 0}
+
+    def add(self, wp_id, url, photo_id=None, sha256=None, size=None):
+        with self._lock:
+            # Keep a known sha256/size if the row already exists (e.g. seeded, then hashed)
+            self.conn.execute("""
+                INSERT INTO media (wp_id, url, sha256, size, created_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(wp_id) DO UPDATE SET
+                    url = excluded.url,
+                    sha256 = COALESCE(excluded.sha256, media.sha256),
+                    size = COALESCE(excluded.size, media.size)
+            """, (wp_id, url, sha256, size, time.time()))
+            if photo_id:
+                self.conn.execute("INSERT OR REPLACE INTO photos (photo_id, wp_id) VALUES (?, ?)", (str(photo_id), wp_id))
+            self.conn.commit()
+
+    def forget(self, wp_id):
+        """
+        Drops a mapping (e.g. the attachment was deleted in WordPress).
+        """
+        with self._lock:
+            self.conn.execute("DELETE FROM photos WHERE wp_id = ?", (wp_id,))
+            self.conn.execute("DELETE FROM media WHERE wp_id = ?", (wp_id,))
+            self.conn.commit()
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+            self.conn.commit()
+
+    def record_reuse(self, size):
+        with self._lock:
+            self.reused += 1
+            self.bytes_saved += size or 0
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+        return {'entries': entries, 'reused': self.reused, 'bytes_saved': self.bytes_saved}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_media_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = MediaIndex()
+    return _index
+
+def pexels_id_from_filename(filename):
+    match = PEXELS_FILENAME_RE.search(filename or '')
+    return match.group(1) if match else None
+
+def ensure_seeded(client, index=None):
+    """
+    On first run, imports the site's existing media library: attachments whose
+    filenames carry a Pexels photo id become reusable immediately.
+    Returns the number of Pexels photos found (0 if already seeded).
+    """
+    index = index or get_media_index()
+    if index.get_meta('seeded_at'):
+        return 0
+    found = 0
+    try:
+        for m in wordpress.iter_media_library(client):
+            photo_id = pexels_id_from_filename(m['filename'])
+            if photo_id:
+                index.add(m['id'], m['url'], photo_id=photo_id)
+                found += 1
+    except Exception as e:
+        # Leave unseeded so the next run tries again
+        print(f"Media library seeding failed: {e}")
+        return found
+    index.set_meta('seeded_at', time.time())
+    return found
+
+def upload_photos(publisher, photos, caption, index=None):
+    """
+    Puts Pexels photos (from images.search_photos) into WordPress through a
+    publisher (publisher.get_publisher()), reusing
+    existing attachments where possible:
+      1. known Pexels id      -> reuse, nothing downloaded
+      2. known content hash   -> reuse, nothing uploaded
+      3. otherwise download + upload (all uploads in one batched request),
+         and remember it
+    Returns [{'id': ..., 'url': ..., 'reused': bool}] in the order of photos.
+    """
+    index = index or get_media_index()
+    results = {}
+    to_fetch = []
+    for photo in photos:
+        hit = index.find_by_photo(photo['id'])
+        if hit:
+            index.record_reuse(hit['size'])
+            results[photo['id']] = {'id': hit['id'], 'url': hit['url'], 'reused': True}
+        else:
+            to_fetch.append(photo)
+
+    # Remaining downloads run concurrently into memory
+    filenames = [f"pexels-photo-{p['id']}{_extension(p['url'])}" for p in to_fetch]
+    buffers = []
+    if to_fetch:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(to_fetch)) as executor:
+            buffers = list(executor.map(images.fetch_image, [p['url'] for p in to_fetch], filenames))
+
+    # New content is uploaded in one go (a single multicall over XML-RPC)
+    uploads = []
+    pending = {}  # sha256 -> (size, [photo ids]); same content is uploaded once
+    for photo, image in zip(to_fetch, buffers):
+        if image is None:
+            continue
+        # Resize / re-encode before hashing so the hash matches what is actually stored
+        image = images.process_image(image)
+        try:
+            data = image.read()
+            name, mime_type = image.name, image.mime_type
+        finally:
+            image.close()
+        digest = hashlib.sha256(data).hexdigest()
+        hit = index.find_by_hash(digest)
+        if hit:
+            index.record_reuse(len(data))
+            index.add(hit['id'], hit['url'], photo_id=photo['id'])
+            results[photo['id']] = {'id': hit['id'], 'url': hit['url'], 'reused': True}
+            continue
+        if digest in pending:
+            pending[digest][1].append(photo['id'])
+            continue
+        uploads.append((data, name, mime_type))
+        pending[digest] = (len(data), [photo['id']])
+
+    try:
+        responses = publisher.upload_images(uploads) if uploads else []
+    except Exception as e:
+        print(f"Image upload failed: {e}")
+        responses = []
+    for (digest, (size, photo_ids)), uploaded in zip(pending.items(), responses):
+        if isinstance(uploaded, Exception):
+            print(f"Image upload failed: {uploaded}")
+            continue
+        for n, photo_id in enumerate(photo_ids):
+            index.add(uploaded['id'], uploaded['url'], photo_id=photo_id, sha256=digest, size=size)
+            results[photo_id] = {'id': uploaded['id'], 'url': uploaded['url'], 'reused': n > 0}
+
+    # Only photos now in WordPress count as used; the rest go back to the reservoir
+    reservoir = images.get_reservoir()
+    reservoir.mark_used([p['id'] for p in photos if p['id'] in results])
+    reservoir.release([p['id'] for p in photos if p['id'] not in results])
+    return [results[p['id']] for p in photos if p['id'] in results]
+
+def _extension(url):
+    ext = os.path.splitext(url.split('?')[0])[1]
+    return ext if ext else '.jpg'
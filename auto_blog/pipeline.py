@@ -0,0 +1,163 @@
+import queue
+import threading
+import traceback
+
+_DONE = object()
+
+class Stage:
+    """
+    One step of a Pipeline.
+    func(item, emit) returns the item to hand to the next stage, or None to drop it.
+    emit(event_dict) sends a progress event back to the caller's thread.
+    """
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages, each with its own worker threads and
+    a bounded queue in front of it. When a downstream stage is slow its queue
+    fills up and upstream workers block (backpressure), so throughput is set by
+    the slowest stage rather than the sum of all stages.
+
+    run() is a generator that yields event dicts in the calling thread:
+      {'type': 'result', 'item': ...}   item made it through every stage
+      {'type': 'dropped', 'stage': ..., 'item': ...}
+      {'type': 'error', 'stage': ..., 'item': ..., 'message': ...}
+      plus whatever the stage functions emit().
+
+    stop_event / pause_event may be passed in to control a run from another
+    thread: setting stop_event works like stop(); while pause_event is set
+    no new items are fed (items in flight still finish).
+    """
+    def __init__(self, stages, queue_size=2, stop_event=None, pause_event=None):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.events = queue.Queue()
+        self.stop_event = stop_event or threading.Event()
+        self.pause_event = pause_event or threading.Event()
+        self._slots = None
+        self._max_results = None
+        self._results = 0
+        self._results_lock = threading.Lock()
+        self._threads = []
+
+    def stop(self):
+        """
+        Stops feeding new items; items already in flight are finished.
+        """
+        self.stop_event.set()
+
+    def stats(self):
+        return {stage.name: q.qsize() for stage, q in zip(self.stages, self.queues)}
+
+    def run(self, source, max_results=None):
+        """
+        Pulls items from the source iterable and yields events until the source
+        is exhausted (or max_results items completed, or stop() was called)
+        and every in-flight item has finished.
+        """
+        if max_results is not None:
+            # One slot per item allowed in flight; completed items keep their slot,
+            # so no more than max_results can ever complete.
+            self._slots = threading.Semaphore(max_results)
+            self._max_results = max_results
+
+        feeder = threading.Thread(target=self._feed, args=(iter(source),), daemon=True)
+        self._threads.append(feeder)
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for n in range(stage.workers):
+                t = threading.Thread(
+                    target=self._work, args=(index, remaining, lock),
+                    name=f"pipeline-{stage.name}-{n}", daemon=True
+                )
+                self._threads.append(t)
+
+        for t in self._threads:
+            t.start()
+
+        try:
+            while True:
+                event = self.events.get()
+                if event is _DONE:
+                    break
+                yield event
+        finally:
+            # Caller went away (or we finished): stop feeding, let in-flight items drain
+            self.stop()
+
+        for t in self._threads:
+            t.join()
+
+    def _feed(self, source):
+        try:
+            while not self.stop_event.is_set():
+                if self.pause_event.is_set():
+                    self.stop_event.wait(0.5)
+                    continue
+                if self._slots is not None:
+                    # Wait for a free slot, but keep checking for stop()
+                    while not self._slots.acquire(timeout=0.5):
+                        if self.stop_event.is_set():
+                            return
+                try:
+                    item = next(source)
+                except StopIteration:
+                    self._release_slot()
+                    return
+                except Exception as e:
+                    self._release_slot()
+                    self.events.put({'type': 'error', 'stage': 'source', 'item': None, 'message': str(e)})
+                    return
+                # Blocks while the first stage's queue is full (backpressure)
+                self.queues[0].put(item)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.queues[0].put(_DONE)
+
+    def _work(self, index, remaining, lock):
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        while True:
+            item = self.queues[index].get()
+            if item is _DONE:
+                break
+            try:
+                out = stage.func(item, self.events.put)
+            except Exception as e:
+                traceback.print_exc()
+                self._release_slot()
+                self.events.put({'type': 'error', 'stage': stage.name, 'item': item, 'message': str(e)})
+                continue
+
+            if out is None:
+                self._release_slot()
+                self.events.put({'type': 'dropped', 'stage': stage.name, 'item': item})
+            elif is_last:
+                self.events.put({'type': 'result', 'item': out})
+                with self._results_lock:
+                    self._results += 1
+                    if self._max_results is not None and self._results >= self._max_results:
+                        self.stop()
+            else:
+                self.queues[index + 1].put(out)
+
+        # Last worker of this stage to exit tells the next stage (or the caller) we're done
+        with lock:
+            remaining[0] -= 1
+            last_out = remaining[0] == 0
+        if last_out:
+            if is_last:
+                self.events.put(_DONE)
+            else:
+                for _ in range(self.stages[index + 1].workers):
+                    self.queues[index + 1].put(_DONE)
+
+    def _release_slot(self):
+        if self._slots is not None:
+            self._slots.release()
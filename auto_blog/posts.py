@@ -0,0 +1,161 @@
+import sys
+import html
+import time
+import sqlite3
+import threading
+from .config import POST_INDEX_PATH, POST_SYNC_PAGE_SIZE
+from .history import normalize_title
+from . import wordpress
+
+class PostIndex:
+    """
+    Local SQLite mirror of the site's published posts (id, title, link,
+    modified date, tags), used for internal linking and duplicate checks
+    without paging through the whole site on every run.
+    """
+    def __init__(self, path=POST_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                link TEXT NOT NULL,
+                modified TEXT,
+                tags TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_modified ON posts(modified)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def upsert(self, records, replace_all=False):
+        """
+        Inserts or updates post records (dicts from wordpress.post_record).
+        replace_all drops every other row first, in the same transaction.
+        """
+        rows = [(r['id'], r['title'], r['link'], r.get('modified', ''), ','.join(r.get('tags') or [])) for r in records]
+        with self._lock:
+            with self.conn:
+                if replace_all:
+                    self.conn.execute("DELETE FROM posts")
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO posts (id, title, link, modified, tags) VALUES (?, ?, ?, ?, ?)", rows
+                )
+
+    def all(self):
+        """
+        Every mirrored post as {'id', 'title', 'link', 'modified', 'tags'}.
+        """
+        with self._lock:
+            rows = self.conn.execute("SELECT id, title, link, modified, tags FROM posts ORDER BY id").fetchall()
+        return [
+            {'id': r[0], 'title': r[1], 'link': r[2], 'modified': r[3], 'tags': r[4].split(',') if r[4] else []}
+            for r in rows
+        ]
+
+    def find_by_title(self, title):
+        """
+        Id of a mirrored post with this title (ignoring case, punctuation and
+        HTML entities), or None.
+        """
+        wanted = normalize_title(title)
+        with self._lock:
+            rows = self.conn.execute("SELECT id, title FROM posts ORDER BY id DESC").fetchall()
+        for post_id, existing in rows:
+            if normalize_title(html.unescape(existing)) == wanted:
+                return post_id
+        return None
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+            self.conn.commit()
+
+    def stats(self):
+        return {
+            'posts': self.count(),
+            'last_modified': self.get_meta('last_modified_gmt'),
+            'synced_at': float(self.get_meta('synced_at') or 0),
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_post_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PostIndex()
+    return _index
+
+def _iter_pages(client, params, page_size):
+    offset = 0
+    while True:
+        page = wordpress.fetch_post_page(client, params, offset, page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+def sync(client, full=False, index=None, page_size=POST_SYNC_PAGE_SIZE):
+    """
+    Brings the mirror up to date.
+    Incremental (default): pages through posts newest-modified first and
+    stops at the last sync's high-water mark, so only changed posts are pulled.
+    Full: re-reads every post (parallel pages) and replaces the mirror
+    (recovery, and the only way to notice deleted/unpublished posts).
+    Returns {'full': bool, 'fetched': int, 'posts': int}; on failure the
+    mirror is left as it was.
+    """
+    index = index or get_post_index()
+    # GMT watermark; mirrors that only have the old local-clock 'last_modified' resync once
+    watermark = index.get_meta('last_modified_gmt')
+    full = full or not watermark
+
+    fetched = []
+    try:
+        if full:
+            print("Full post index resync...")
+            # Parallel pages; any page that keeps failing aborts the resync
+            fetched.extend(wordpress.iter_all_posts(client, page_size=page_size))
+        else:
+            params = {'post_status': 'publish', 'orderby': 'modified', 'order': 'DESC'}
+            for page in _iter_pages(client, params, page_size):
+                # Ties on the watermark are re-read; upserts make that harmless
+                changed = [r for r in page if r['modified'] >= watermark]
+                fetched.extend(changed)
+                if len(changed) < len(page):
+                    break
+    except Exception as e:
+        print(f"Post index sync failed: {e}")
+        return {'full': full, 'fetched': 0, 'posts': index.count()}
+
+    index.upsert(fetched, replace_all=full)
+    newest = max((r['modified'] for r in fetched), default=None)
+    if newest and (full or newest > watermark):
+        index.set_meta('last_modified_gmt', newest)
+    index.set_meta('synced_at', time.time())
+    total = index.count()
+    print(f"Post index synced: {len(fetched)} fetched, {total} total")
+    return {'full': full, 'fetched': len(fetched), 'posts': total}
+
+if __name__ == "__main__":
+    # python -m auto_blog.posts [sync|resync]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'sync'
+    print(sync(wordpress.get_wp_client(), full=(command == 'resync')))
@@ -0,0 +1,219 @@
+import html
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from .config import (
+    WP_USERNAME, WP_PASSWORD, WP_BACKEND, WP_REST_URL, WP_UPLOAD_BATCH,
+    WP_POOL_MAXSIZE, WP_CONNECT_TIMEOUT, WP_READ_TIMEOUT,
+)
+from .ratelimit import APIError, get_limiter, with_rate_limit
+from . import wordpress
+
+# Publishers share one interface:
+#   upload_images([(data, filename, mime_type), ...]) -> [{'id', 'url'} or Exception]
+#   create_post(title, content, tags, image_id=None, categories=None, custom_fields=None) -> post_id
+#   get_post_links([post_id, ...]) -> {post_id: link}
+
+class XmlRpcPublisher:
+    """
+    Publishes through wordpress_xmlrpc (uploads batched via system.multicall).
+    Holds one XML-RPC client, so use one instance per thread.
+    """
+    name = 'xmlrpc'
+
+    def __init__(self, client=None):
+        self.client = client or wordpress.get_wp_client()
+
+    def upload_images(self, images):
+        # Not retried: a batch that reached the server but timed out on the
+        # response would upload every image again. Kept small since each
+        # image travels base64-encoded in the request body
+        batch = wordpress.MultiCall(self.client, max_batch=WP_UPLOAD_BATCH, retry=False)
+        for data, filename, mime_type in images:
+            batch.add(wordpress.upload_method(data, filename, mime_type))
+        return [r if isinstance(r, Exception) else wordpress.upload_result(r) for r in batch.execute()]
+
+    def create_post(self, title, content, tags, image_id=None, categories=None, custom_fields=None):
+        return wordpress.create_wp_post(self.client, title, content, tags, image_id, categories, custom_fields=custom_fields)
+
+    def get_post_links(self, post_ids):
+        return wordpress.get_post_links(self.client, post_ids)
+
+
+class RestPublisher:
+    """
+    Publishes through the WordPress REST API (/wp-json/wp/v2) with an
+    application password. Media goes up as the raw file body (no base64/XML
+    wrapping) and every call reuses a pooled keep-alive session, so one
+    instance is shared by all threads.
+    """
+    name = 'rest'
+
+    def __init__(self, base_url=WP_REST_URL, username=WP_USERNAME, password=WP_PASSWORD,
+                 pool_maxsize=WP_POOL_MAXSIZE, connect_timeout=WP_CONNECT_TIMEOUT, read_timeout=WP_READ_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.auth = (username, password)
+        self._lock = threading.Lock()
+        self._terms = {}   # (taxonomy, lowercased name) -> term id
+        self._links = {}   # post id -> permalink, from create_post responses
+        self._local = threading.local()
+
+    def _send(self, method, path, **kwargs):
+        response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        get_limiter('wordpress').update_from_headers(response.headers)
+        if response.status_code >= 400:
+            raise APIError.from_response("WordPress REST Error", response)
+        return response.json()
+
+    @with_rate_limit('wordpress')
+    def request(self, method, path, **kwargs):
+        return self._send(method, path, **kwargs)
+
+    # Single attempt: a retried create after a 5xx could create it twice
+    @with_rate_limit('wordpress', max_attempts=1)
+    def request_once(self, method, path, **kwargs):
+        return self._send(method, path, **kwargs)
+
+    def check(self):
+        """
+        Verifies the REST API is reachable and the credentials work.
+        """
+        self.request('GET', '/users/me', params={'context': 'edit', '_fields': 'id'})
+
+    def upload_images(self, images):
+        results = []
+        for data, filename, mime_type in images:
+            headers = {
+                'Content-Type': mime_type or 'image/jpeg',
+                'Content-Disposition': f'attachment; filename="{filename}"',
+            }
+            try:
+                # Once only, like the XML-RPC batch: a retry after a timeout or
+                # 5xx that reached the server would add the image again
+                media = self.request_once('POST', '/media', data=data, headers=headers)
+                results.append({'id': media['id'], 'url': media.get('source_url', '')})
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _term_ids(self, taxonomy, names):
+        """
+        Term ids for names in taxonomy ('tags' or 'categories'), creating missing terms.
+        """
+        ids = []
+        for name in names:
+            name = name.strip()
+            if not name:
+                continue
+            key = (taxonomy, name.lower())
+            with self._lock:
+                term_id = self._terms.get(key)
+            if term_id is None:
+                term_id = self._find_term(taxonomy, name)
+                if term_id is None:
+                    try:
+                        term_id = self.request_once('POST', f'/{taxonomy}', json={'name': name})['id']
+                    except APIError:
+                        # Another worker may have just created it
+                        term_id = self._find_term(taxonomy, name)
+                        if term_id is None:
+                            raise
+                with self._lock:
+                    self._terms[key] = term_id
+            ids.append(term_id)
+        return ids
+
+    def _find_term(self, taxonomy, name):
+        found = self.request('GET', f'/{taxonomy}', params={'search': name, 'per_page': 100, '_fields': 'id,name'})
+        for term in found:
+            if html.unescape(term['name']).lower() == name.lower():
+                return term['id']
+        return None
+
+    def create_post(self, title, content, tags, image_id=None, categories=None, custom_fields=None):
+        payload = {
+            'title': title,
+            'content': content,
+            'status': 'publish',
+            'tags': self._term_ids('tags', tags.split(',') if tags else []),
+            'categories': self._term_ids('categories', categories if categories else ['Uncategorized']),
+        }
+        if image_id:
+            payload['featured_media'] = image_id
+        if custom_fields:
+            payload['meta'] = {f['key']: f['value'] for f in custom_fields}
+
+        post = self.request_once('POST', '/posts', json=payload)
+        with self._lock:
+            self._links[post['id']] = post.get('link')
+
+        # REST only writes meta keys registered with show_in_rest (SEO plugin
+        # keys usually aren't); XML-RPC can still set the rest
+        saved = post.get('meta') or {}
+        missing = [f for f in custom_fields or [] if f['key'] not in saved]
+        if missing:
+            try:
+                wordpress.set_custom_fields(self._xmlrpc_client(), post['id'], missing)
+            except Exception as e:
+                print(f"Error setting custom fields on post {post['id']}: {e}")
+        return post['id']
+
+    def _xmlrpc_client(self):
+        # xmlrpc clients are not thread-safe: one per thread, created on first use
+        if getattr(self._local, 'client', None) is None:
+            self._local.client = wordpress.get_wp_client()
+        return self._local.client
+
+    def get_post_links(self, post_ids):
+        with self._lock:
+            links = {i: self._links.pop(i) for i in post_ids if self._links.get(i)}
+        missing = [i for i in post_ids if i not in links]
+        if missing:
+            try:
+                found = self.request('GET', '/posts', params={
+                    'include': ','.join(str(i) for i in missing),
+                    'per_page': 100,
+                    '_fields': 'id,link',
+                })
+                links.update({p['id']: p['link'] for p in found})
+            except Exception as e:
+                print(f"Error fetching permalinks: {e}")
+        return {i: links.get(i) or wordpress.shortlink(i) for i in post_ids}
+
+
+_rest = None
+_rest_failed = False
+_rest_lock = threading.Lock()
+
+def get_rest_publisher():
+    """
+    The shared RestPublisher, or None if the REST API can't be used
+    (checked once per process).
+    """
+    global _rest, _rest_failed
+    with _rest_lock:
+        if _rest is None and not _rest_failed:
+            try:
+                publisher = RestPublisher()
+                publisher.check()
+                _rest = publisher
+            except Exception as e:
+                print(f"WordPress REST API unavailable ({e}), falling back to XML-RPC.")
+                _rest_failed = True
+    return _rest
+
+def get_publisher(client=None):
+    """
+    Publisher for the configured WP_BACKEND ('rest' or 'xmlrpc').
+    XML-RPC publishers wrap client (or a new one), so get one per thread.
+    """
+    if WP_BACKEND == 'rest':
+        rest = get_rest_publisher()
+        if rest is not None:
+            return rest
+    return XmlRpcPublisher(client)
@@ -0,0 +1,230 @@
+import time
+import random
+import threading
+import functools
+import email.utils
+from .config import RATE_LIMITS
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class APIError(Exception):
+    """
+    HTTP-level error from an upstream API, carrying the status code and
+    the server's Retry-After hint (seconds) when it sent one.
+    """
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_response(cls, prefix, response):
+        return cls(
+            f"{prefix} {response.status_code}: {response.text}",
+            status_code=response.status_code,
+            retry_after=parse_retry_after(response.headers.get('Retry-After')),
+        )
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header (delta seconds or HTTP date) into seconds.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_reset(value):
+    """
+    Rate-limit reset headers come as a delay, a unix timestamp or a unix
+    timestamp in milliseconds depending on the provider. Returns seconds from now.
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value > 1e12:
+        value = value / 1000.0 - time.time()
+    elif value > 1e9:
+        value = value - time.time()
+    return max(0.0, value)
+
+def status_from_exception(e):
+    """
+    Extracts an HTTP status code from the exception types our clients raise.
+    """
+    if isinstance(e, APIError):
+        return e.status_code
+    response = getattr(e, 'response', None)  # requests.HTTPError, pytrends errors
+    if response is not None and getattr(response, 'status_code', None):
+        return response.status_code
+    return getattr(e, 'errcode', None)  # xmlrpc ProtocolError
+
+
+class TokenBucket:
+    """
+    Classic token bucket. reserve() takes tokens immediately (the balance may
+    go negative) and returns how long the caller must wait, so concurrent
+    callers queue up in order instead of polling.
+    """
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_min / 4.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class ProviderLimiter:
+    """
+    Process-wide limiter for one provider: a requests/min bucket, an optional
+    tokens/min bucket, and a shared pause that all callers respect after a 429
+    or an exhausted rate-limit header.
+    """
+    def __init__(self, name, rpm, tpm=None):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm, capacity=tpm) if tpm else None
+        self.blocked_until = 0.0
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    def acquire(self, tokens=0):
+        """
+        Blocks until this caller may send one request (of ~tokens size).
+        """
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                pause = self.blocked_until - time.time()
+                if pause <= 0:
+                    break
+                time.sleep(pause)
+            wait = self.requests.reserve(1)
+            if tokens and self.tokens:
+                wait = max(wait, self.tokens.reserve(tokens))
+            if wait > 0:
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def penalize(self, delay):
+        """
+        Pauses every caller of this provider for delay seconds.
+        """
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.time() + delay)
+
+    def update_from_headers(self, headers):
+        """
+        Adapts to X-RateLimit-Remaining / X-RateLimit-Reset style headers.
+        """
+        if not headers:
+            return
+        remaining = headers.get('X-RateLimit-Remaining') or headers.get('X-Ratelimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset') or headers.get('X-Ratelimit-Reset')
+        try:
+            remaining = int(float(remaining)) if remaining is not None else None
+        except ValueError:
+            remaining = None
+        if remaining is not None and remaining <= 0:
+            delay = parse_reset(reset)
+            if delay:
+                self.penalize(delay)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'paused_for': round(max(0.0, self.blocked_until - time.time()), 1),
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider):
+    """
+    Returns the shared limiter for 'openrouter', 'pexels', 'google_trends' or 'wordpress'.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            conf = RATE_LIMITS.get(provider, {'rpm': 60})
+            limiter = ProviderLimiter(provider, conf['rpm'], conf.get('tpm'))
+            _limiters[provider] = limiter
+        return limiter
+
+def limiter_stats():
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
+
+
+def with_rate_limit(provider, max_attempts=5, base_delay=2, max_delay=120, cost=None, reraise=True):
+    """
+    Decorator: acquires from the provider's limiter before every attempt and
+    retries typed retryable failures (429/5xx, timeouts) with jittered backoff.
+    A 429 pauses the whole provider (honoring Retry-After) so parallel workers
+    don't stampede. cost(*args, **kwargs) may return a token estimate.
+    After max_attempts the last error is re-raised, or None is returned if reraise=False.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            limiter = get_limiter(provider)
+            tokens = cost(*args, **kwargs) if cost else 0
+            last_error = None
+            for attempt in range(max_attempts):
+                limiter.acquire(tokens)
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    status = status_from_exception(e)
+                    transient = status is None and _is_transient(e)
+                    if status not in RETRY_STATUSES and not transient:
+                        raise
+                    last_error = e
+                    if attempt == max_attempts - 1:
+                        break
+                    retry_after = getattr(e, 'retry_after', None)
+                    # Full jitter keeps parallel workers from retrying in lockstep
+                    delay = retry_after if retry_after is not None else random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                    print(f"{provider} error ({status or type(e).__name__}), attempt {attempt+1}/{max_attempts}. Retrying in {delay:.1f}s...")
+                    if status == 429:
+                        limiter.penalize(delay)
+                    else:
+                        time.sleep(delay)
+            print("Max retries exceeded.")
+            if reraise and last_error is not None:
+                raise last_error
+            return None
+        return wrapper
+    return decorator
+
+def _is_transient(e):
+    # Network-level failures without a status code (requests Timeout/ConnectionError)
+    name = type(e).__name__
+    return name in ('Timeout', 'ConnectTimeout', 'ReadTimeout', 'ConnectionError', 'ChunkedEncodingError')
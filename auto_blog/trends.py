@@ -1,13 +1,111 @@
-import time
 import random
 import json
+import hashlib
+import threading
+import concurrent.futures
+from array import array
 from pytrends.request import TrendReq
-from .config import TRENDS_HL, TRENDS_TIMEZONE
-from .content import query_llm
+from .config import (
+    TRENDS_HL, TRENDS_TIMEZONE, TRENDS_BATCH_SIZE,
+    TRENDS_CACHE_ENABLED, TRENDS_CACHE_PATH, TRENDS_CACHE_MAX_ENTRIES,
+    METRICS_WORKERS,
+)
+from .content import query_llm, get_llm_cache, llm_cache_key
+from .cache import DiskCache
+from .ratelimit import with_rate_limit
+
+# How long Trends answers stay fresh, by timeframe (seconds)
+TRENDS_TTLS = {
+    'now 1-H': 10 * 60,
+    'now 4-H': 30 * 60,
+    'now 1-d': 2 * 3600,
+    'now 7-d': 6 * 3600,
+    'today 1-m': 24 * 3600,
+    'today 3-m': 2 * 24 * 3600,
+    'today 12-m': 7 * 24 * 3600,
+    'today 5-y': 30 * 24 * 3600,
+}
+DEFAULT_TRENDS_TTL = 24 * 3600
+
+_trends_cache = None
+_trends_cache_lock = threading.Lock()
+
+def get_trends_cache():
+    """
+    Returns the shared on-disk Google Trends cache (None if disabled).
+    """
+    global _trends_cache
+    if not TRENDS_CACHE_ENABLED:
+        return None
+    if _trends_cache is None:
+        with _trends_cache_lock:
+            if _trends_cache is None:
+                _trends_cache = DiskCache(TRENDS_CACHE_PATH, max_entries=TRENDS_CACHE_MAX_ENTRIES)
+    return _trends_cache
+
+def trends_cache_key(kind, keywords, geo='', timeframe='', hl=TRENDS_HL):
+    raw = json.dumps([kind, list(keywords), geo, timeframe, hl])
+    return f"trends:{kind}:" + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def trends_ttl(timeframe):
+    return TRENDS_TTLS.get(timeframe, DEFAULT_TRENDS_TTL)
+
+@with_rate_limit('google_trends', base_delay=5)
+def fetch_interest_over_time(pytrends, kw_list, region='US', time_range='today 3-m'):
+    """
+    build_payload + interest_over_time through the shared Google Trends limiter.
+    """
+    pytrends.build_payload(kw_list, cat=0, timeframe=time_range, geo=region, gprop='')
+    return pytrends.interest_over_time()
+
+@with_rate_limit('google_trends', base_delay=5)
+def fetch_related_queries(pytrends, kw_list, time_range='now 7-d', geo=''):
+    pytrends.build_payload(kw_list, cat=0, timeframe=time_range, geo=geo)
+    return pytrends.related_queries()
+
+@with_rate_limit('google_trends', base_delay=5)
+def fetch_suggestions(pytrends, keyword):
+    return pytrends.suggestions(keyword)
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+def _number(value, default):
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _completed_chunks(futures):
+    for future in concurrent.futures.as_completed(futures):
+        chunk = futures[future]
+        try:
+            yield chunk, future.result()
+        except Exception as e:
+            print(f"LLM Analysis failed for {len(chunk)} keywords: {e}")
+            yield chunk, {}
+
+def _sorted_rows(rows):
+    return sorted(rows.values(), key=lambda x: x['score'], reverse=True)
 
 class KeywordResearcher:
+    """
+    Safe to share between threads/sessions: pytrends keeps the current
+    payload on the client, so build_payload + fetch run under one lock.
+    """
     def __init__(self):
-        self.pytrends = TrendReq(hl=TRENDS_HL, tz=TRENDS_TIMEZONE)
+        self._pytrends = None
+        self._lock = threading.RLock()
+
+    @property
+    def pytrends(self):
+        # Built on first use: fully cached research never needs the cookie bootstrap request
+        with self._lock:
+            if self._pytrends is None:
+                self._pytrends = TrendReq(hl=TRENDS_HL, tz=TRENDS_TIMEZONE)
+            return self._pytrends
 
     def suggest_niches(self):
         """
@@ -20,7 +118,7 @@ class KeywordResearcher:
         Example: ["AI Productivity Tools", "Urban Gardening", "Digital Minimalism"]
         """
         try:
-            text = query_llm(prompt)
+            text = query_llm(prompt, cache_ttl=6 * 3600)
             # clean json
             start = text.find('[')
             end = text.rfind(']') + 1
@@ -50,52 +148,110 @@ class KeywordResearcher:
         
         Return ONLY the keywords, one per line. No numbering.
         """
-        text = query_llm(prompt)
+        text = query_llm(prompt, cache_ttl=24 * 3600)
         if not text: return []
         return [line.strip() for line in text.split('\n') if line.strip()]
 
+    def get_trend_series(self, keywords, region='US', time_range='today 3-m'):
+        """
+        Fetches weekly/daily interest series from Google Trends, 5 keywords per request.
+        Every batch after the first includes a shared anchor keyword; each batch is
+        rescaled so the anchor matches its first-batch level, which makes scores
+        comparable across batches. Everything is then put on one 0-100 scale.
+        Returns a dict: {keyword: [values]} (empty list if Trends had no data)
+        """
+        keywords = list(dict.fromkeys(keywords))  # pytrends rejects duplicates
+        raw = {}
+        anchor = None
+        anchor_ref = 0.0
+
+        # First batch: 5 keywords, no anchor yet; the strongest one becomes the anchor
+        first = keywords[:TRENDS_BATCH_SIZE]
+        raw.update(self._fetch_batch(first, region, time_range))
+        means = {kw: _mean(raw.get(kw)) for kw in first}
+        if means and max(means.values()) > 0:
+            anchor = max(means, key=means.get)
+            anchor_ref = means[anchor]
+
+        rest = keywords[TRENDS_BATCH_SIZE:]
+        step = TRENDS_BATCH_SIZE - 1 if anchor else TRENDS_BATCH_SIZE
+        for i in range(0, len(rest), step):
+            chunk = rest[i:i+step]
+            batch = self._fetch_batch([anchor] + chunk if anchor else chunk, region, time_range)
+            factor = 1.0
+            if anchor:
+                anchor_mean = _mean(batch.get(anchor))
+                if anchor_mean > 0:
+                    factor = anchor_ref / anchor_mean
+            for kw in chunk:
+                raw[kw] = [v * factor for v in batch.get(kw, [])]
+
+        # Common 0-100 scale across all batches
+        peak = max((max(v) for v in raw.values() if v), default=0)
+        scale = 100.0 / peak if peak > 0 else 0.0
+        return {kw: [round(v * scale, 1) for v in raw.get(kw, [])] for kw in keywords}
+
+    def _fetch_batch(self, kw_list, region, time_range):
+        # Scores are relative within a payload, so the payload (keyword list) is the cache unit
+        cache = get_trends_cache()
+        key = trends_cache_key('iot', kw_list, region, time_range)
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                return {kw: list(values) for kw, values in cached.items()}
+
+        try:
+            # Pacing is handled by the shared google_trends rate limiter
+            with self._lock:
+                data = fetch_interest_over_time(self.pytrends, kw_list, region, time_range)
+        except Exception as e:
+            print(f"Trends Error for {kw_list}: {e}")
+            return {}
+        result = {}
+        if data is not None and not data.empty:
+            result = {kw: data[kw].astype(float).tolist() for kw in kw_list if kw in data.columns}
+        if cache:
+            # Compact float32 arrays instead of pickled DataFrames
+            cache.set(key, {kw: array('f', values) for kw, values in result.items()}, ttl=trends_ttl(time_range))
+        return result
+
     def get_trend_data(self, keywords, region='US', time_range='today 3-m'):
         """
         Fetches trend interest (0-100) from Google Trends.
-        Returns a dict: {keyword: score}
+        Returns a dict: {keyword: score} (average of the comparable series)
         """
-        scores = {}
-        # Batch requests to avoid rate limits (5 at a time is pytrends limit usually)
-        chunk_size = 1 # reduced to 1 to be safe and avoid 429s as much as possible with backoff
-        
-        # print(f"Fetching Trends data for {len(keywords)} keywords in {region}...")
-        
-        for kw in keywords:
-            try:
-                # Random sleep to play nice
-                time.sleep(random.uniform(1, 2)) 
-                self.pytrends.build_payload([kw], cat=0, timeframe=time_range, geo=region, gprop='')
-                data = self.pytrends.interest_over_time()
-                if not data.empty:
-                    # Get average interest over the period
-                    avg_score = data[kw].mean()
-                    scores[kw] = round(avg_score, 1)
-                else:
-                    scores[kw] = 0
-            except Exception as e:
-                # print(f"Trends Error for {kw}: {e}")
-                # Fallback: Assign a random low-ish score or 0
-                scores[kw] = 0
-        
-        return scores
+        series = self.get_trend_series(keywords, region, time_range)
+        return {kw: round(_mean(values), 1) for kw, values in series.items()}
 
     def analyze_metrics_llm(self, keywords, region='US'):
         """
         Uses LLM to estimate Volume, KD, and Intent.
         """
-        # Process in chunks to fit context window
         results = {}
-        chunk_size = 20
-        
-        for i in range(0, len(keywords), chunk_size):
-            chunk = keywords[i:i+chunk_size]
-            
-            prompt = f"""
+        for chunk, metrics in self.iter_metrics_llm(keywords, region):
+            results.update(metrics)
+        return results
+
+    def iter_metrics_llm(self, keywords, region='US', chunk_size=20, workers=METRICS_WORKERS, max_attempts=3):
+        """
+        Same as analyze_metrics_llm, but chunks run concurrently (at most `workers`
+        at once) and each (chunk, metrics) pair is yielded as soon as it finishes.
+        A failed chunk is retried on its own; after max_attempts it yields {}.
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = self._submit_metrics(executor, keywords, region, chunk_size, max_attempts)
+            yield from _completed_chunks(futures)
+        finally:
+            executor.shutdown(wait=False)
+
+    def _submit_metrics(self, executor, keywords, region, chunk_size=20, max_attempts=3):
+        # Process in chunks to fit context window
+        chunks = [keywords[i:i+chunk_size] for i in range(0, len(keywords), chunk_size)]
+        return {executor.submit(self._metrics_chunk, chunk, region, max_attempts): chunk for chunk in chunks}
+
+    def _metrics_chunk(self, chunk, region, max_attempts):
+        prompt = f"""
             Analyze the following keywords for the {region} market.
             Estimate the following metrics for each:
             1. Monthly Search Volume (Volume): Number (e.g. 500, 10000)
@@ -112,82 +268,169 @@ class KeywordResearcher:
               ...
             }}
             """
+        last_error = None
+        for attempt in range(max_attempts):
+            # Retries must not be served the same (bad) cached answer
+            use_cache = attempt == 0
             try:
-                text = query_llm(prompt, reasoning_enabled=True)
+                text = query_llm(prompt, reasoning_enabled=True, use_cache=use_cache, cache_ttl=7 * 24 * 3600)
                 # Extract JSON
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start != -1 and end != -1:
-                    json_data = json.loads(text[start:end])
-                    results.update(json_data)
+                start = text.find('{') if text else -1
+                end = text.rfind('}') + 1 if text else 0
+                if start != -1 and end > start:
+                    json_data = json.loads(text[start:end], strict=False)
+                    if isinstance(json_data, dict) and json_data:
+                        return json_data
+                last_error = "no JSON object in response"
             except Exception as e:
-                print(f"LLM Analysis failed: {e}")
-                
-        return results
+                last_error = e
+            if use_cache:
+                get_llm_cache().delete(llm_cache_key(prompt, True))
+            print(f"LLM Analysis attempt {attempt+1}/{max_attempts} failed: {last_error}")
+        raise Exception(f"giving up after {max_attempts} attempts ({last_error})")
 
-    def analyze_niche(self, niche, sub_niche="", region='US', time_range='today 3-m'):
+    def score_keyword(self, kw, metrics, series):
         """
-        Orchestrates the full 7-step analysis.
+        Combines LLM metrics and the trend series into one result row.
         """
-        # Step 1: Seeds
-        seeds = self.generate_seeds(niche, sub_niche)
-        if not seeds: return []
+        if not metrics:
+            metrics = {'volume': 0, 'kd': 50, 'intent': 'Informational'}
+        trend = round(_mean(series), 1)
+        vol = _number(metrics.get('volume', 0), 0)
+        kd = _number(metrics.get('kd', 50), 50)
+        intent_str = metrics.get('intent', 'Informational')
         
-        # Step 2: Trends (Real Data)
-        # Filter: If trend < 10, maybe discard? Let's keep data for scoring.
-        trend_scores = self.get_trend_data(seeds[:10], region, time_range) # LIMIT TO 10 for speed in demo/dev
+        # --- STRICT FILTERING REMOVED (User Request) ---
+        # We now allow all intents but score them appropriately
+        # ---------------------------------------
         
-        # Step 3, 4, 5: Metrics (LLM)
-        valid_seeds = list(trend_scores.keys())
-        llm_metrics = self.analyze_metrics_llm(valid_seeds, region)
         
-        final_results = []
+        # Step 5: Intent Mapping
+        intent_map = {
+            'Informational': 1,
+            'Commercial': 2,
+            'Transactional': 2,
+            'Navigational': 0
+        }
+        intent_score = intent_map.get(intent_str, 1)
         
-        for kw in valid_seeds:
-            metrics = llm_metrics.get(kw, {'volume': 0, 'kd': 50, 'intent': 'Informational'})
-            
-            trend = trend_scores.get(kw, 0)
-            vol = metrics.get('volume', 0)
-            kd = metrics.get('kd', 50)
-            intent_str = metrics.get('intent', 'Informational')
-            
-            # --- STRICT FILTERING REMOVED (User Request) ---
-            # We now allow all intents but score them appropriately
-            # ---------------------------------------
-            
-            
-            # Step 5: Intent Mapping
-            intent_map = {
-                'Informational': 1,
-                'Commercial': 2,
-                'Transactional': 2,
-                'Navigational': 0
-            }
-            intent_score = intent_map.get(intent_str, 1)
-            
-            # Step 3 Validation: Volume normalization (0-100)
-            vol_score = min(vol / 50.0, 100)
-            
-            # Step 6: Scoring Formula
-            # Adjusted for Informational Focus: Boost Intent, Boost KD weight slightly
-            # Intent is theoretically fixed to 1/Informational now due to filter, so it's a constant.
-            # Focus on Trend & Vol mainly, KD is already low.
-            
-            score = (trend * 0.40) + (vol_score * 0.30) + ((100 - kd) * 0.30)
-            
-            final_results.append({
-                'keyword': kw,
-                'trend': trend,
-                'volume': vol,
-                'kd': kd,
-                'intent': intent_str,
-                'score': round(score, 1)
-            })
-            
-        # Sort by Score
-        final_results.sort(key=lambda x: x['score'], reverse=True)
+        # Step 3 Validation: Volume normalization (0-100)
+        vol_score = min(vol / 50.0, 100)
+        
+        # Step 6: Scoring Formula
+        # Adjusted for Informational Focus: Boost Intent, Boost KD weight slightly
+        # Intent is theoretically fixed to 1/Informational now due to filter, so it's a constant.
+        # Focus on Trend & Vol mainly, KD is already low.
+        
+        score = (trend * 0.40) + (vol_score * 0.30) + ((100 - kd) * 0.30)
+        
+        return {
+            'keyword': kw,
+            'trend': trend,
+            'trend_series': series,
+            'volume': vol,
+            'kd': kd,
+            'intent': intent_str,
+            'score': round(score, 1)
+        }
+
+    def analyze_niche(self, niche, sub_niche="", region='US', time_range='today 3-m'):
+        """
+        Orchestrates the full 7-step analysis.
+        """
+        final_results = []
+        for final_results in self.iter_analyze_niche(niche, sub_niche, region, time_range):
+            pass
         return final_results
 
+    def iter_analyze_niche(self, niche, sub_niche="", region='US', time_range='today 3-m'):
+        """
+        Generator form of analyze_niche: yields the sorted result list each time
+        another chunk of LLM metrics arrives, so the UI can fill in progressively.
+        """
+        # Step 1: Seeds
+        seeds = self.generate_seeds(niche, sub_niche)
+        if not seeds: return
+        seeds = list(dict.fromkeys(seeds))
+
+        # Step 3, 4, 5: Metrics (LLM) - independent of Trends, so start them first
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=METRICS_WORKERS)
+        try:
+            futures = self._submit_metrics(executor, seeds, region)
+
+            # Step 2: Trends (Real Data), batched 5 per request so every seed is scored
+            # Filter: If trend < 10, maybe discard? Let's keep data for scoring.
+            trend_series = self.get_trend_series(seeds, region, time_range)
+
+            rows = {kw: self.score_keyword(kw, None, trend_series.get(kw, [])) for kw in seeds}
+            yield _sorted_rows(rows)
+
+            for chunk, llm_metrics in _completed_chunks(futures):
+                for kw in chunk:
+                    rows[kw] = self.score_keyword(kw, llm_metrics.get(kw), trend_series.get(kw, []))
+                # Sort by Score
+                yield _sorted_rows(rows)
+        finally:
+            executor.shutdown(wait=False)
+
+
+def get_related_queries(client, keyword, time_range='now 7-d', geo=''):
+    """
+    Rising and top related queries for a keyword (cached).
+    client: callable returning a TrendReq. geo '' is worldwide.
+    Returns {'rising': [...], 'top': [...]}
+    """
+    cache = get_trends_cache()
+    key = trends_cache_key('related', [keyword], geo, time_range)
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    related = fetch_related_queries(client(), [keyword], time_range, geo)
+    result = {'rising': [], 'top': []}
+    if related and keyword in related:
+        for kind in ('rising', 'top'):
+            frame = related[keyword][kind]
+            if frame is not None:
+                result[kind] = frame['query'].tolist()
+    if cache:
+        cache.set(key, result, ttl=trends_ttl(time_range))
+    return result
+
+def get_suggestions(client, keyword):
+    """
+    Autocomplete suggestion titles for a keyword (cached).
+    """
+    cache = get_trends_cache()
+    key = trends_cache_key('suggestions', [keyword])
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    titles = [s['title'] for s in fetch_suggestions(client(), keyword)]
+    if cache:
+        cache.set(key, titles, ttl=DEFAULT_TRENDS_TTL)
+    return titles
+
+def get_ai_fallback_keywords(sub_niche, count=10):
+    """
+    Asks the LLM for keywords when Trends returns too few.
+    """
+    prompt = f"""
+    Act as a Keyword Research Expert.
+    Suggest {count} specific, long-tail blog post keywords people are searching for about: "{sub_niche}".
+    Focus on **Informational** intent (How-to, Guides, Ideas, Tips, Mistakes).
+    Return ONLY the keywords, one per line. No numbering.
+    """
+    try:
+        text = query_llm(prompt, cache_ttl=24 * 3600)
+    except Exception as e:
+        print(f"AI keyword fallback error: {e}")
+        return []
+    if not text: return []
+    return [line.strip() for line in text.split('\n') if line.strip()][:count]
 
 def get_trending_keywords(sub_niche, limit=15):
     """
@@ -197,32 +440,26 @@ def get_trending_keywords(sub_niche, limit=15):
     3. AI Fallback (if others fail)
     """
     unique_keywords = set()
+    pytrends = None
+
+    def client():
+        # TrendReq does a cookie bootstrap request, so only build it on a cache miss
+        nonlocal pytrends
+        if pytrends is None:
+            pytrends = TrendReq(hl=TRENDS_HL, tz=TRENDS_TIMEZONE)
+        return pytrends
     
     # 1. Try Google Trends Related Queries
     try:
-        pytrends = TrendReq(hl=TRENDS_HL, tz=TRENDS_TIMEZONE)
-        pytrends.build_payload([sub_niche], cat=0, timeframe='now 7-d')
-        
-        related = pytrends.related_queries()
-        if related and sub_niche in related:
-            # Rising
-            if related[sub_niche]['rising'] is not None:
-                rising = related[sub_niche]['rising']
-                unique_keywords.update(rising['query'].tolist())
-            
-            # Top
-            if related[sub_niche]['top'] is not None:
-                top = related[sub_niche]['top']
-                unique_keywords.update(top['query'].head(5).tolist())
-                
+        related = get_related_queries(client, sub_niche, 'now 7-d')
+        unique_keywords.update(related['rising'])
+        unique_keywords.update(related['top'][:5])
     except Exception as e:
         print(f"Trends API specific error: {e}")
 
     # 2. Try Suggestions (Autocomplete) - lighter on rate limits
     try:
-        suggestions = pytrends.suggestions(sub_niche)
-        for s in suggestions:
-            unique_keywords.add(s['title'])
+        unique_keywords.update(get_suggestions(client, sub_niche))
     except Exception as e:
         print(f"Suggestions API error: {e}")
 
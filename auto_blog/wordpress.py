@@ -1,33 +1,86 @@
 from wordpress_xmlrpc import Client, WordPressPost
-from wordpress_xmlrpc.methods.posts import NewPost, GetPosts
-from wordpress_xmlrpc.methods.media import UploadFile
+from wordpress_xmlrpc.methods.posts import NewPost, EditPost, GetPost, GetPosts
+from wordpress_xmlrpc.methods.media import UploadFile, GetMediaLibrary
 from wordpress_xmlrpc.compat import xmlrpc_client
 import mimetypes
 import os
-from .config import WP_URL, WP_USERNAME, WP_PASSWORD
+import queue
+import contextlib
+import threading
+import concurrent.futures
+from .config import WP_URL, WP_USERNAME, WP_PASSWORD, WP_PAGE_SIZE, WP_FETCH_WORKERS, WP_MULTICALL_BATCH
+from .ratelimit import with_rate_limit
 
 def get_wp_client():
     return Client(WP_URL, WP_USERNAME, WP_PASSWORD)
 
+class ClientPool:
+    """
+    Reusable XML-RPC clients (creating one costs a supportedMethods round
+    trip). A client is lent to one caller at a time, since clients are not
+    thread-safe, and goes back to the pool afterwards.
+    """
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self.created = 0
+        self._idle = queue.LifoQueue()
+
+    @contextlib.contextmanager
+    def client(self):
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            client = get_wp_client()
+            self.created += 1
+        try:
+            yield client
+        finally:
+            if self._idle.qsize() < self.max_idle:
+                self._idle.put(client)
+
 def upload_image_to_wp(client, image_path, caption):
     """
     Uploads an image to the WordPress media library.
     """
     filename = os.path.basename(image_path)
+    with open(image_path, 'rb') as img:
+        return upload_image_bytes(client, img.read(), filename, caption)
+
+def upload_method(data, filename, mime_type=None):
+    """
+    The UploadFile call for in-memory image data (for client.call or MultiCall).
+    """
     # guesses mime type
-    mime_type = mimetypes.guess_type(filename)[0] or 'image/jpeg'
+    mime_type = mime_type or mimetypes.guess_type(filename)[0] or 'image/jpeg'
     
-    data = {
+    payload = {
         'name': filename,
         'type': mime_type,
+        'bits': xmlrpc_client.Binary(data),
     }
-    
-    with open(image_path, 'rb') as img:
-        data['bits'] = xmlrpc_client.Binary(img.read())
-        
-    response = client.call(UploadFile(data))
+    return UploadFile(payload)
+
+def upload_result(response):
     return {'id': response['id'], 'url': response.get('url', '')}
 
+@with_rate_limit('wordpress')
+def upload_image_bytes(client, data, filename, caption=None, mime_type=None):
+    """
+    Uploads in-memory image data (bytes) to the WordPress media library.
+    """
+    return upload_result(client.call(upload_method(data, filename, mime_type)))
+
+def upload_image_buffer(client, image, caption=None):
+    """
+    Uploads an images.ImageBuffer and closes it.
+    """
+    try:
+        return upload_image_bytes(client, image.read(), image.name, caption, image.mime_type)
+    finally:
+        image.close()
+
+# Single attempt: a retried NewPost after a 5xx could publish the post twice
+@with_rate_limit('wordpress', max_attempts=1)
 def create_wp_post(client, title, content, tags, image_id=None, categories=None, custom_fields=None):
     """
     Creates and publishes a new post on WordPress.
@@ -52,13 +105,68 @@ def create_wp_post(client, title, content, tags, image_id=None, categories=None,
     post_id = client.call(NewPost(post))
     return post_id
 
+# Single attempt: custom fields are added, so a retry could duplicate them
+@with_rate_limit('wordpress', max_attempts=1)
+def set_custom_fields(client, post_id, custom_fields):
+    """
+    Adds custom fields to an existing post.
+    """
+    post = WordPressPost()
+    post.custom_fields = custom_fields
+    return client.call(EditPost(post_id, post))
+
+def shortlink(post_id):
+    """
+    The ?p=<id> link WordPress redirects to a post's permalink.
+    """
+    site_url = WP_URL.rsplit('/xmlrpc.php', 1)[0].rstrip('/')
+    return f"{site_url}/?p={post_id}"
+
+def get_post_links(client, post_ids):
+    """
+    Permalinks for several published posts in one round trip
+    ({post_id: link}); posts that can't be looked up get their shortlink.
+    """
+    batch = MultiCall(client)
+    for post_id in post_ids:
+        batch.add(GetPost(post_id, fields=['link']))
+    links = {}
+    try:
+        results = batch.execute()
+    except Exception as e:
+        print(f"Error fetching permalinks: {e}")
+        results = [None] * len(post_ids)
+    for post_id, result in zip(post_ids, results):
+        link = getattr(result, 'link', None)
+        if isinstance(result, Exception):
+            print(f"Error fetching permalink for post {post_id}: {result}")
+        links[post_id] = link or shortlink(post_id)
+    return links
+
+def get_post_link(client, post_id):
+    """
+    Returns the permalink of a published post, falling back to the
+    ?p=<id> shortlink if WordPress can't be asked.
+    """
+    return get_post_links(client, [post_id])[post_id]
+
+@with_rate_limit('wordpress')
+def fetch_posts(client, params, fields=None):
+    """
+    GetPosts through the shared WordPress rate limiter.
+    fields restricts the returned post fields (e.g. POST_INDEX_FIELDS).
+    """
+    if fields:
+        return client.call(GetPosts(params, fields))
+    return client.call(GetPosts(params))
+
 def get_recent_posts(client, limit=10):
     """
     Fetches recent posts for internal linking.
     Returns list of dicts: [{'title': '...', 'link': '...'}]
     """
     try:
-        posts = client.call(GetPosts({'number': limit, 'post_status': 'publish'}))
+        posts = fetch_posts(client, {'number': limit, 'post_status': 'publish'})
         results = []
         for p in posts:
             results.append({
@@ -70,40 +178,219 @@ def get_recent_posts(client, limit=10):
         print(f"Error fetching recent posts: {e}")
         return []
 
+# Only what the post index needs (wp.getPosts returns full bodies otherwise).
+# date_modified is read from post_modified_gmt; without it the library fills in the current time
+POST_INDEX_FIELDS = ['post_id', 'post_title', 'link', 'post_modified_gmt', 'terms']
+
+def post_record(p):
+    """
+    Flattens a WordPressPost into the dict kept by the post index.
+    """
+    modified = getattr(p, 'date_modified', None)
+    terms = getattr(p, 'terms', None) or []
+    return {
+        'id': int(p.id),
+        'title': p.title,
+        'link': p.link,
+        'modified': modified.strftime("%Y-%m-%d %H:%M:%S") if modified else '',
+        'tags': [t.name for t in terms if getattr(t, 'taxonomy', '') == 'post_tag'],
+    }
+
+def fetch_post_page(client, params, offset, page_size, fields=POST_INDEX_FIELDS):
+    """
+    One page of posts as post_record dicts. Transient failures are retried by
+    fetch_posts' rate limiter; anything else is raised.
+    """
+    page = fetch_posts(client, dict(params, number=page_size, offset=offset), fields)
+    return [post_record(p) for p in page or []]
+
+def iter_all_posts(client, params=None, page_size=WP_PAGE_SIZE, workers=WP_FETCH_WORKERS):
+    """
+    Yields every published post (post_record dicts) as pages arrive, so
+    callers can start indexing before the last page is in.
+    The first page is fetched with client; if there is more, the remaining
+    offsets are fetched in parallel, one XML-RPC client per worker thread
+    (clients are not thread-safe). Raises if a page keeps failing.
+    """
+    params = params or {'post_status': 'publish', 'orderby': 'ID', 'order': 'ASC'}
+    first = fetch_post_page(client, params, 0, page_size)
+    for post in first:
+        yield post
+    if len(first) < page_size:
+        return
+
+    local = threading.local()
+
+    def fetch(offset):
+        if getattr(local, 'client', None) is None:
+            local.client = get_wp_client()
+        return fetch_post_page(local.client, params, offset, page_size)
+
+    end = None  # No page at or past this offset has posts
+    next_offset = page_size
+    pending = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while True:
+                while len(pending) < workers and (end is None or next_offset < end):
+                    pending[executor.submit(fetch, next_offset)] = next_offset
+                    next_offset += page_size
+                if not pending:
+                    return
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    offset = pending.pop(future)
+                    page = future.result()
+                    if len(page) < page_size:
+                        end = min(end or offset + page_size, offset + page_size)
+                    for post in page:
+                        yield post
+        finally:
+            # Consumer stopped early or a page failed: don't start what's still queued
+            for future in pending:
+                future.cancel()
+
 def get_all_posts(client):
     """
-    Fetches ALL published posts (paginated) to build a full link index.
+    Fetches ALL published posts (parallel pages) to build a full link index.
     """
     all_posts = []
-    offset = 0
-    batch_size = 20
-    
     print("Fetching all posts for link index...")
-    while True:
-        try:
-            posts = client.call(GetPosts({
-                'number': batch_size, 
-                'offset': offset, 
-                'post_status': 'publish'
-            }))
-            
-            if not posts:
-                break
-                
-            for p in posts:
-                all_posts.append({'title': p.title, 'link': p.link})
-            
-            offset += batch_size
-            # Safety break to avoid infinite loops if API is weird
-            if len(posts) < batch_size:
-                break
-        except Exception as e:
-            print(f"Error fetching batch at offset {offset}: {e}")
-            break
-            
+    try:
+        for post in iter_all_posts(client):
+            all_posts.append(post)
+    except Exception as e:
+        print(f"Error fetching posts: {e}")
     print(f"Total posts fetched: {len(all_posts)}")
     return all_posts
 
+_multicall_stats = {'batches': 0, 'calls': 0}
+_multicall_lock = threading.Lock()
+_multicall_unsupported = set()  # URLs whose server rejected system.multicall
+
+@with_rate_limit('wordpress')
+def _send_batch(batch):
+    return batch()
+
+# Single attempt: retrying a batch that contains NewPost could publish twice
+@with_rate_limit('wordpress', max_attempts=1)
+def _send_batch_once(batch):
+    return batch()
+
+@with_rate_limit('wordpress')
+def _call(client, method):
+    return client.call(method)
+
+@with_rate_limit('wordpress', max_attempts=1)
+def _call_once(client, method):
+    return client.call(method)
+
+class MultiCall:
+    """
+    Groups wordpress_xmlrpc method objects (UploadFile, GetPost, NewPost, ...)
+    into system.multicall requests, so N calls cost one round trip and one
+    WordPress bootstrap instead of N.
+    execute() returns one entry per added call, in order: the call's result,
+    or the exception for that call alone (a Fault in one call doesn't fail
+    the others). Servers without system.multicall get one request per call.
+    retry=False for batches that must not be sent twice (NewPost, UploadFile).
+    """
+    def __init__(self, client, max_batch=WP_MULTICALL_BATCH, retry=True):
+        self.client = client
+        self.max_batch = max_batch
+        self.retry = retry
+        self.methods = []
+
+    def __len__(self):
+        return len(self.methods)
+
+    def add(self, method):
+        """
+        Queues a call; returns its position in execute()'s results.
+        """
+        self.methods.append(method)
+        return len(self.methods) - 1
+
+    def execute(self):
+        methods, self.methods = self.methods, []
+        results = []
+        for start in range(0, len(methods), self.max_batch):
+            results.extend(self._send(methods[start:start + self.max_batch]))
+        return results
+
+    def _send(self, methods):
+        if len(methods) == 1 or self.client.url in _multicall_unsupported:
+            return self._send_each(methods)
+
+        batch = xmlrpc_client.MultiCall(self.client.server)
+        for method in methods:
+            getattr(batch, method.method_name)(*method.get_args(self.client))
+        try:
+            raw = (_send_batch if self.retry else _send_batch_once)(batch)
+        except xmlrpc_client.Fault as e:
+            # Only "method not found" means the server can't batch
+            if e.faultCode != -32601 and 'multicall' not in str(e.faultString):
+                raise
+            print("system.multicall not supported by this server, sending calls one by one.")
+            _multicall_unsupported.add(self.client.url)
+            return self._send_each(methods)
+
+        with _multicall_lock:
+            _multicall_stats['batches'] += 1
+            _multicall_stats['calls'] += len(methods)
+        results = []
+        for i, method in enumerate(methods):
+            try:
+                # Indexing raises the Fault for that call only
+                results.append(method.process_result(raw[i]))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _send_each(self, methods):
+        call = _call if self.retry else _call_once
+        results = []
+        for method in methods:
+            try:
+                results.append(call(self.client, method))
+            except Exception as e:
+                results.append(e)
+        return results
+
+def multicall_stats():
+    """
+    Calls sent through system.multicall and the round trips that saved.
+    """
+    with _multicall_lock:
+        stats = dict(_multicall_stats)
+    stats['round_trips_saved'] = stats['calls'] - stats['batches']
+    return stats
+
+@with_rate_limit('wordpress')
+def fetch_media(client, params):
+    """
+    GetMediaLibrary through the shared WordPress rate limiter.
+    """
+    return client.call(GetMediaLibrary(params))
+
+def iter_media_library(client, batch_size=100):
+    """
+    Yields every image in the media library as {'id': ..., 'url': ..., 'filename': ...}.
+    """
+    offset = 0
+    while True:
+        items = fetch_media(client, {'number': batch_size, 'offset': offset, 'mime_type': 'image'})
+        if not items:
+            break
+        for m in items:
+            url = getattr(m, 'link', '') or ''
+            metadata = getattr(m, 'metadata', None) or {}
+            filename = metadata.get('file', '') if isinstance(metadata, dict) else ''
+            yield {'id': m.id, 'url': url, 'filename': os.path.basename(filename or url)}
+        if len(items) < batch_size:
+            break
+        offset += batch_size
+
 if __name__ == "__main__":
     # Test connection
     client = get_wp_client()
@@ -0,0 +1,20 @@
+import json
+from auto_blog import main
+
+
+def test_stdout_carries_only_json_lines(monkeypatch, capsys):
+    def noisy_run(keywords, niche, max_posts, stop_event=None, **options):
+        print(f"Searching photos for {niche}...")
+        yield {'type': 'status', 'message': "writing"}
+        print("Uploaded 3 images")
+        yield {'type': 'done', 'count': 1}
+    monkeypatch.setattr(main, 'run_mass_automation_gen', noisy_run)
+
+    code = main.cli(['run', '--niche', 'garden: tomatoes', '--niche', 'kitchen: knives', '--parallel', '2'])
+
+    captured = capsys.readouterr()
+    events = [json.loads(line) for line in captured.out.splitlines()]
+    assert code == 0
+    assert events[-1]['type'] == 'summary'
+    assert events[-1]['published'] == 2
+    assert "Uploaded 3 images" in captured.err
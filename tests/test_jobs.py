@@ -0,0 +1,169 @@
+import time
+import threading
+import pytest
+from auto_blog import jobs
+from auto_blog.pipeline import Pipeline, Stage
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def store(tmp_path):
+    return jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    # Keep heartbeats away from the real LLM cache file
+    stats = {'llm_hits': 3, 'llm_misses': 1, 'round_trips_saved': 4, 'limiters': {}}
+    monkeypatch.setattr(jobs, 'runtime_stats', lambda: stats)
+    return stats
+
+
+@pytest.fixture
+def runners(monkeypatch):
+    table = dict(jobs.JOB_RUNNERS)
+    monkeypatch.setattr(jobs, 'JOB_RUNNERS', table)
+    return table
+
+
+def pipeline_runner(store, job, control):
+    # Like run_mass_job: the pipeline gets the job's stop_event and sets it when it ends
+    pipeline = Pipeline([Stage('double', lambda item, emit: item * 2)],
+                        stop_event=control.stop_event, pause_event=control.pause_event)
+    for event in pipeline.run(iter(range(3))):
+        store.record(job['id'], event, progress={'published': event['item']})
+
+
+def blocking_runner(store, job, control):
+    control.stop_event.wait(5)
+
+
+def start_worker(store):
+    worker = jobs.Worker(store, concurrency=1, poll_interval=0.01)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    return worker, thread
+
+
+def test_job_that_completes_normally_is_done(store, runners):
+    runners['stub'] = pipeline_runner
+    job_id = store.submit('stub', {})
+
+    jobs.Worker(store, concurrency=1, poll_interval=0.01).run(once=True)
+
+    job = store.get(job_id)
+    assert job['status'] == 'done'
+    assert job['finished_at'] is not None
+    assert len(store.events(job_id)) == 3
+
+
+def test_failing_job_is_failed(store, runners):
+    def broken(store, job, control):
+        raise RuntimeError("boom")
+    runners['stub'] = broken
+    job_id = store.submit('stub', {})
+
+    jobs.Worker(store, concurrency=1, poll_interval=0.01).run(once=True)
+
+    job = store.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == "boom"
+
+
+def test_cancel_running_job(store, runners):
+    runners['stub'] = blocking_runner
+    job_id = store.submit('stub', {})
+    worker, thread = start_worker(store)
+    try:
+        assert wait_for(lambda: store.get(job_id)['status'] == 'running')
+        store.cancel(job_id)
+        assert wait_for(lambda: store.get(job_id)['status'] == 'cancelled')
+    finally:
+        worker.stop_event.set()
+        thread.join(5)
+
+
+def test_cancel_queued_job_is_immediate(store):
+    job_id = store.submit('stub', {})
+    store.cancel(job_id)
+    assert store.get(job_id)['status'] == 'cancelled'
+    assert store.claim('w1') is None
+
+
+def test_stale_job_is_requeued_and_old_worker_cannot_finish_it(store):
+    job_id = store.submit('stub', {})
+    assert store.claim('dead-worker')['id'] == job_id
+    assert store.claim('w2') is None  # still held, heartbeat fresh
+
+    store._write("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - jobs.JOB_STALE_AFTER - 1, job_id))
+    assert store.claim('w2')['id'] == job_id
+
+    store.finish(job_id, 'dead-worker', 'cancelled')
+    assert store.get(job_id)['status'] == 'running'
+    store.finish(job_id, 'w2', 'done')
+    assert store.get(job_id)['status'] == 'done'
+
+
+def test_stale_job_with_cancel_requested_is_cancelled(store):
+    job_id = store.submit('stub', {})
+    store.claim('dead-worker')
+    store.cancel(job_id)
+    store._write("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - jobs.JOB_STALE_AFTER - 1, job_id))
+
+    assert store.claim('w2') is None
+    assert store.get(job_id)['status'] == 'cancelled'
+
+
+def test_worker_shutdown_requeues_running_jobs(store, runners):
+    runners['stub'] = blocking_runner
+    job_id = store.submit('stub', {})
+    worker, thread = start_worker(store)
+    assert wait_for(lambda: store.get(job_id)['status'] == 'running')
+
+    worker.stop_event.set()
+    thread.join(5)
+
+    assert store.get(job_id)['status'] == 'queued'
+    assert store.claim('w2')['id'] == job_id
+
+
+def test_pause_and_resume(store, runners):
+    runners['stub'] = blocking_runner
+    job_id = store.submit('stub', {})
+    worker, thread = start_worker(store)
+    try:
+        assert wait_for(lambda: store.get(job_id)['status'] == 'running')
+        store.pause(job_id)
+        assert wait_for(lambda: store.get(job_id)['status'] == 'paused')
+        store.resume(job_id)
+        assert wait_for(lambda: store.get(job_id)['status'] == 'running')
+    finally:
+        store.cancel(job_id)
+        worker.stop_event.set()
+        thread.join(5)
+
+
+def test_tail_filters_by_event_type(store):
+    job_id = store.submit('stub', {})
+    for i in range(4):
+        store.record(job_id, {'type': 'validation', 'title': f"t{i}"})
+        store.record(job_id, {'type': 'status', 'message': 'x'})
+
+    assert [e['title'] for e in store.tail(job_id, limit=2, event_type='validation')] == ['t2', 't3']
+
+
+def test_worker_reports_its_stats_with_heartbeats(store, stats):
+    worker = jobs.Worker(store, concurrency=1, poll_interval=0.01)
+    worker.poll()
+    assert store.worker_stats() == [stats]
+
+    store.remove_worker(worker.worker_id)
+    assert store.worker_stats() == []
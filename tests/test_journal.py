@@ -0,0 +1,161 @@
+import threading
+import pytest
+from auto_blog import journal, main, content, images, media, posts, publisher, history, wordpress
+
+
+@pytest.fixture
+def log(tmp_path):
+    return journal.StageJournal(str(tmp_path / "journal.sqlite3"))
+
+
+def attempts(log, key):
+    return log.get(key)['attempts']
+
+
+def test_new_item_records_stage_outputs(log):
+    owner = journal.make_owner()
+    entry = log.open('s:a', 's', owner, keyword='a', title='A')
+    assert entry['stage'] == 'claimed'
+    assert entry['attempts'] == 1
+
+    log.record('s:a', 'written', post_data={'title': 'A'})
+    log.record('s:a', 'media', uploaded_imgs=[{'id': 7}])
+
+    saved = log.get('s:a')
+    assert saved['stage'] == 'media'
+    assert saved['post_data'] == {'title': 'A'}
+    assert saved['uploaded_imgs'] == [{'id': 7}]
+
+
+def test_item_held_by_live_run_is_not_taken(log):
+    log.open('s:a', 's', journal.make_owner())
+    assert log.open('s:a', 's', journal.make_owner()) is None
+    assert log.resumable('s', journal.make_owner()) == []
+
+
+def test_released_item_is_resumed_from_its_last_stage(log):
+    first = journal.make_owner()
+    log.open('s:a', 's', first, keyword='a')
+    log.record('s:a', 'written', post_data={'title': 'A'})
+    log.release(first)
+
+    second = journal.make_owner()
+    assert [c['key'] for c in log.resumable('s', second)] == ['s:a']
+    entry = log.open('s:a', 's', second)
+    assert entry['stage'] == 'written'
+    assert entry['post_data'] == {'title': 'A'}
+    assert entry['attempts'] == 2
+
+
+def test_finished_item_is_not_reopened(log):
+    owner = journal.make_owner()
+    log.open('s:a', 's', owner)
+    log.record('s:a', 'published', post_id=5)
+    log.release(owner)
+
+    assert log.open('s:a', 's', journal.make_owner()) is None
+    assert log.resumable('s', journal.make_owner()) == []
+
+
+def test_item_is_given_up_after_max_attempts(log, monkeypatch):
+    monkeypatch.setattr(journal, 'JOURNAL_MAX_ATTEMPTS', 2)
+    owner = journal.make_owner()
+    log.open('s:a', 's', owner)
+    log.release(owner)
+    owner = journal.make_owner()
+    assert log.open('s:a', 's', owner) is not None
+    log.release(owner)
+
+    assert log.open('s:a', 's', journal.make_owner()) is None
+    assert log.get('s:a')['stage'] == 'failed'
+
+
+def test_resumable_takes_nothing(log):
+    owner = journal.make_owner()
+    for name in 'abc':
+        log.open(f's:{name}', 's', owner)
+    log.release(owner)
+
+    assert len(log.resumable('s', journal.make_owner())) == 3
+    assert [attempts(log, f's:{name}') for name in 'abc'] == [1, 1, 1]
+
+
+class FakePublisher:
+    name = 'fake'
+
+    def __init__(self):
+        self.created = []
+
+    def create_post(self, title, content, tags, image_id=None, categories=None, custom_fields=None):
+        self.created.append(title)
+        return len(self.created)
+
+    def get_post_links(self, post_ids):
+        return {i: f"https://example.com/{i}" for i in post_ids}
+
+
+@pytest.fixture
+def fake(log, tmp_path, monkeypatch):
+    """
+    Everything run_mass_automation_gen talks to, minus the LLM and photos.
+    """
+    fake = FakePublisher()
+    monkeypatch.setattr(journal, 'get_journal', lambda: log)
+    monkeypatch.setattr(history, 'get_history_store', lambda: history.HistoryStore(str(tmp_path / "history.sqlite3")))
+    index = posts.PostIndex(str(tmp_path / "posts.sqlite3"))
+    monkeypatch.setattr(posts, 'get_post_index', lambda: index)
+    monkeypatch.setattr(posts, 'sync', lambda client: None)
+    monkeypatch.setattr(media, 'ensure_seeded', lambda client: 0)
+    monkeypatch.setattr(publisher, 'get_publisher', lambda client=None: fake)
+    monkeypatch.setattr(wordpress, 'shortlink', lambda post_id: f"https://example.com/?p={post_id}")
+    monkeypatch.setattr(content, 'generate_titles_batch', lambda *a, **k: {})
+    monkeypatch.setattr(images, 'take_photos', lambda *a, **k: [])
+    return fake
+
+
+def test_mass_run_capped_by_max_posts_leaves_other_items_untouched(log, fake, monkeypatch):
+    scope = "mass:garden"
+    previous = journal.make_owner()
+    keys = []
+    for n in range(5):
+        title = f"Journaled post number {n}"
+        key = f"{scope}:{history.normalize_title(title)}"
+        keys.append(key)
+        log.open(key, scope, previous, keyword='garden', title=title)
+        log.record(key, 'written', post_data={'title': title, 'content': '<p>x</p>', 'tags': 'a'}, validation_results={})
+        log.record(key, 'media', uploaded_imgs=[])
+    log.release(previous)
+
+    def no_llm(*args, **kwargs):
+        raise AssertionError("journaled drafts must not be regenerated")
+    monkeypatch.setattr(content, 'generate_blog_post', no_llm)
+
+    events = list(main.run_mass_automation_gen(['garden'], 'garden', 2, client=object()))
+
+    assert events[-1] == {'type': 'done', 'count': 2}
+    assert fake.created == ["Journaled post number 0", "Journaled post number 1"]
+    assert [log.get(k)['stage'] for k in keys] == ['published', 'published', 'media', 'media', 'media']
+    assert [attempts(log, k) for k in keys] == [2, 2, 1, 1, 1]
+    assert all(log.get(k)['owner'] is None for k in keys[2:])
+
+
+def test_photos_reserved_for_a_failed_post_are_released(fake, monkeypatch):
+    released = []
+    reservoir = type('Reservoir', (), {'release': lambda self, ids: released.extend(ids)})()
+    monkeypatch.setattr(images, 'get_reservoir', lambda: reservoir)
+    monkeypatch.setattr(images, 'take_photos', lambda query, count=1: [{'id': 11}, {'id': 12}])
+    monkeypatch.setattr(content, 'generate_titles_batch', lambda *a, **k: {'garden': ["A post that fails"]})
+
+    stop_event = threading.Event()
+
+    def failed_generation(title, niche, internal_links=None, on_section=None):
+        on_section('title', title)  # starts the photo search, as streaming does
+        stop_event.set()  # no more titles after this one
+        return None
+    monkeypatch.setattr(content, 'generate_blog_post', failed_generation)
+
+    events = list(main.run_mass_automation_gen(['garden'], 'garden', 1, client=object(), stop_event=stop_event))
+
+    assert events[-1] == {'type': 'done', 'count': 0}
+    assert fake.created == []
+    assert sorted(released) == [11, 12]
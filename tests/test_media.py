@@ -0,0 +1,15 @@
+import pytest
+from auto_blog import media
+
+
+@pytest.mark.parametrize("filename, photo_id", [
+    ("pexels-photo-123.jpeg", "123"),
+    ("pexels-photo-123-1.jpeg", "123"),
+    ("pexels-photo-123-2-1024x768.jpeg", "123"),
+    ("pexels-photo-123-scaled.jpeg", "123"),
+    ("Pexels-Jane-Doe-4567.JPG", "4567"),
+    ("pexels-jane-doe-4567-1.webp", "4567"),
+    ("garden-tips.jpg", None),
+])
+def test_pexels_id_from_filename(filename, photo_id):
+    assert media.pexels_id_from_filename(filename) == photo_id
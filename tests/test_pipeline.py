@@ -0,0 +1,112 @@
+import time
+import queue
+import itertools
+import threading
+from auto_blog.pipeline import Pipeline, Stage
+
+
+def results(events):
+    return [e['item'] for e in events if e['type'] == 'result']
+
+
+def run_in_thread(pipeline, source, **kwargs):
+    out = queue.Queue()
+
+    def consume():
+        for event in pipeline.run(source, **kwargs):
+            out.put(event)
+        out.put(None)
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    return out, thread
+
+
+def drain(out, timeout=5):
+    events = []
+    while True:
+        event = out.get(timeout=timeout)
+        if event is None:
+            return events
+        events.append(event)
+
+
+def test_items_flow_through_every_stage():
+    pipeline = Pipeline([
+        Stage('add', lambda item, emit: item + 1, workers=2),
+        Stage('double', lambda item, emit: item * 2),
+    ])
+    assert sorted(results(pipeline.run(range(5)))) == [2, 4, 6, 8, 10]
+
+
+def test_dropped_items_and_errors_are_reported():
+    def stage(item, emit):
+        if item == 1:
+            return None
+        if item == 2:
+            raise ValueError("bad item")
+        emit({'type': 'status', 'message': f"ok {item}"})
+        return item
+
+    events = list(Pipeline([Stage('check', stage)]).run(range(4)))
+    assert results(events) == [0, 3]
+    assert [e['item'] for e in events if e['type'] == 'dropped'] == [1]
+    assert [e['message'] for e in events if e['type'] == 'error'] == ["bad item"]
+    assert [e['message'] for e in events if e['type'] == 'status'] == ["ok 0", "ok 3"]
+
+
+def test_max_results_stops_an_endless_source():
+    pulled = []
+
+    def source():
+        for n in itertools.count():
+            pulled.append(n)
+            yield n
+
+    pipeline = Pipeline([Stage('slow', lambda item, emit: (time.sleep(0.01), item)[1], workers=3)])
+    assert len(results(pipeline.run(source(), max_results=4))) == 4
+    # Items only enter while a result slot is free
+    assert len(pulled) == 4
+
+
+def test_stop_event_finishes_items_in_flight():
+    stop_event = threading.Event()
+    started = []
+
+    def stage(item, emit):
+        started.append(item)
+        time.sleep(0.05)
+        return item
+
+    pipeline = Pipeline([Stage('work', stage, workers=2)], stop_event=stop_event)
+    out, thread = run_in_thread(pipeline, itertools.count())
+    time.sleep(0.1)
+    stop_event.set()
+    events = drain(out)
+    thread.join(5)
+
+    assert not thread.is_alive()
+    # Every item a worker started was completed, and nothing ran after stop
+    assert sorted(results(events)) == sorted(started)
+    assert len(started) < 20
+
+
+def test_pause_event_holds_new_items_until_cleared():
+    pause_event = threading.Event()
+    pause_event.set()
+    pipeline = Pipeline([Stage('echo', lambda item, emit: item)], pause_event=pause_event)
+    out, thread = run_in_thread(pipeline, range(3))
+
+    time.sleep(0.3)
+    assert out.empty()
+
+    pause_event.clear()
+    events = drain(out)
+    thread.join(5)
+    assert sorted(results(events)) == [0, 1, 2]
+
+
+def test_run_sets_stop_event_when_it_ends():
+    # Callers that share a stop event must not read it as "cancelled"
+    stop_event = threading.Event()
+    list(Pipeline([Stage('echo', lambda item, emit: item)], stop_event=stop_event).run(range(2)))
+    assert stop_event.is_set()
@@ -0,0 +1,83 @@
+import datetime
+import types
+import pytest
+from auto_blog import posts, wordpress
+
+
+class FakeSite:
+    """
+    Stands in for wp.getPosts. Like wordpress_xmlrpc, date_modified comes
+    from post_modified_gmt and falls back to the current time when that
+    field was not requested.
+    """
+    def __init__(self, count):
+        start = datetime.datetime(2024, 1, 1)
+        self.posts = [
+            {'post_id': n, 'post_title': f"Post {n}", 'link': f"https://example.com/{n}",
+             'post_modified_gmt': start + datetime.timedelta(hours=n)}
+            for n in range(1, count + 1)
+        ]
+        self.calls = []
+
+    def fetch_posts(self, client, params, fields=None):
+        self.calls.append(params)
+        key = 'post_modified_gmt' if params.get('orderby') == 'modified' else 'post_id'
+        ordered = sorted(self.posts, key=lambda p: p[key], reverse=params.get('order') == 'DESC')
+        page = ordered[params['offset']:params['offset'] + params['number']]
+        return [self._post(p, fields or []) for p in page]
+
+    def _post(self, raw, fields):
+        return types.SimpleNamespace(
+            id=raw['post_id'], title=raw['post_title'], link=raw['link'], terms=[],
+            date_modified=raw['post_modified_gmt'] if 'post_modified_gmt' in fields else datetime.datetime.now(),
+        )
+
+
+@pytest.fixture
+def site(monkeypatch):
+    site = FakeSite(25)
+    monkeypatch.setattr(wordpress, 'fetch_posts', site.fetch_posts)
+    monkeypatch.setattr(wordpress, 'get_wp_client', lambda: object())
+    return site
+
+
+@pytest.fixture
+def index(tmp_path):
+    return posts.PostIndex(str(tmp_path / "posts.sqlite3"))
+
+
+def test_watermark_is_the_newest_modified_date(site, index):
+    result = posts.sync(object(), index=index, page_size=10)
+    assert result == {'full': True, 'fetched': 25, 'posts': 25}
+    assert index.get_meta('last_modified_gmt') == "2024-01-02 01:00:00"
+
+
+def test_incremental_sync_with_nothing_changed_stops_after_one_page(site, index):
+    posts.sync(object(), index=index, page_size=10)
+    site.calls.clear()
+
+    result = posts.sync(object(), index=index, page_size=10)
+
+    # Only the post sitting on the watermark is re-read
+    assert result == {'full': False, 'fetched': 1, 'posts': 25}
+    assert len(site.calls) == 1
+    assert index.get_meta('last_modified_gmt') == "2024-01-02 01:00:00"
+
+
+def test_incremental_sync_pulls_only_changed_posts(site, index):
+    posts.sync(object(), index=index, page_size=10)
+    site.posts[0]['post_modified_gmt'] = datetime.datetime(2024, 2, 1)
+    site.posts[0]['post_title'] = "Post 1, updated"
+    site.calls.clear()
+
+    result = posts.sync(object(), index=index, page_size=10)
+
+    assert result['fetched'] == 2
+    assert len(site.calls) == 1
+    assert index.find_by_title("Post 1, updated") is not None
+    assert index.get_meta('last_modified_gmt') == "2024-02-01 00:00:00"
+
+
+def test_mirror_with_old_local_clock_watermark_is_resynced(site, index):
+    index.set_meta('last_modified', "2099-01-01 00:00:00")
+    assert posts.sync(object(), index=index, page_size=10)['full'] is True
@@ -0,0 +1,36 @@
+from auto_blog import publisher
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.headers = {}
+        self.text = str(body)
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        return self.responses.pop(0)
+
+
+def test_rest_upload_is_sent_once_even_on_server_error():
+    rest = publisher.RestPublisher(base_url="https://example.com/wp-json/wp/v2", username="u", password="p")
+    rest.session = FakeSession([
+        FakeResponse(503, {'message': "busy"}),
+        FakeResponse(201, {'id': 9, 'source_url': "https://example.com/b.webp"}),
+    ])
+
+    results = rest.upload_images([(b"a", "a.webp", "image/webp"), (b"b", "b.webp", "image/webp")])
+
+    assert isinstance(results[0], publisher.APIError)
+    assert results[1] == {'id': 9, 'url': "https://example.com/b.webp"}
+    assert rest.session.calls == [('POST', "https://example.com/wp-json/wp/v2/media")] * 2